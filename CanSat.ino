@@ -24,7 +24,60 @@ SoftwareSerial gpsSerial(GPS_RXPin, GPS_TXPin);
 // HC-12 SoftwareSerial setup
 SoftwareSerial hc12Serial(HC12_TXPin, HC12_RXPin);
 
-unsigned long timer = 0;
+// Telemetry format: true sends one compact binary frame per update,
+// false sends the three JSON text lines (fallback, readable in Serial Monitor)
+bool binaryTelemetry = false;
+
+// Transmit interval per sensor group in ms, 0 turns the group off. The
+// sensors are sampled continuously; these only set how often they are sent.
+// In binary mode one frame with all groups goes out whenever any group is due.
+// At 9600 baud the HC-12 carries about 20 JSON attitude lines or 18 binary
+// frames per second in total.
+unsigned long attitudeInterval = 1000, environmentInterval = 1000, gpsInterval = 1000;
+unsigned long attitudeSent = 0, environmentSent = 0, gpsSent = 0;
+static const float MAX_RATE = 50.0;  // Hz
+
+// Latest BMP280 readings, taken when the environment group is due
+float temperature = NAN, pressure = NAN, altitude = NAN;
+
+// Ground commands, one text line each, over USB or the HC-12 (see commands.py):
+//   RATE ATT|ENV|GPS <Hz>   transmit rate of a sensor group, 0 turns it off
+//   FORMAT JSON|BINARY      telemetry format
+//   STATUS                  only report the current settings
+// Every command is answered with a JSON line: {"ack": <command>, the current settings}
+static const uint8_t COMMAND_LENGTH = 32;
+char commandLine[COMMAND_LENGTH + 1];
+uint8_t commandLength = 0;
+
+// SoftwareSerial receives on one port at a time. The GPS sends a burst of
+// NMEA sentences once per second; in between, the HC-12 is listened to for
+// commands. The ground station repeats a command until it is acknowledged.
+static const unsigned long GPS_PERIOD = 1000;  // ms between GPS bursts
+static const unsigned long GPS_QUIET = 50;  // ms without a GPS byte that ends a burst
+static const unsigned long GPS_GUARD = 60;  // ms before the next burst to switch back to the GPS
+unsigned long gpsBurstStart = 0, gpsLastByte = 0;
+bool listeningForCommands = false;
+
+// Binary frame layout, little-endian. Must match FRAME_DTYPE in binary_protocol.py
+static const uint8_t FRAME_SYNC1 = 0xAA, FRAME_SYNC2 = 0x55;
+static const uint8_t FRAME_VERSION = 1;
+static const uint8_t FLAG_LOCATION_VALID = 0x01, FLAG_DATE_VALID = 0x02, FLAG_TIME_VALID = 0x04;
+
+struct __attribute__((packed)) TelemetryFrame {
+  uint8_t sync[2];
+  uint8_t version;
+  uint8_t flags;
+  uint16_t seq;
+  uint32_t uptimeMs;  // millis() when the frame was built
+  float yaw, pitch, roll;
+  float temperature, pressure, altitude;
+  int32_t lat, lng;  // degrees * 1e7
+  uint16_t year;
+  uint8_t month, day, hour, minute, second, centisecond;
+  uint16_t crc;  // CRC-16/CCITT-FALSE over everything after the sync bytes
+};
+
+uint16_t frameSeq = 0;
 
 void setup() {
   Serial.begin(9600);
@@ -57,29 +110,170 @@ void setup() {
   // Initialize HC-12
   hc12Serial.begin(HC12Baud);
   Serial.println(F("HC-12 module initialized."));
+
+  // begin() made the HC-12 the listening port; start with the GPS
+  gpsSerial.listen();
+  readBMP280();
 }
 
 void loop() {
-  // Process GPS data
-  while (gpsSerial.available() > 0) {
-    char c = gpsSerial.read();
-    gps.encode(c);
+  // Sample the IMU on every pass: MPU6050_light integrates the gyro between
+  // updates, so the angles are only as good as the update rate
+  mpu.update();
+
+  pollSerialPorts();
+
+  unsigned long now = millis();
+  bool attitudeDue = isDue(attitudeInterval, attitudeSent, now);
+  bool environmentDue = isDue(environmentInterval, environmentSent, now);
+  bool gpsDue = isDue(gpsInterval, gpsSent, now);
+  if (environmentDue) {
+    readBMP280();
+  }
+
+  if (binaryTelemetry) {
+    if (attitudeDue || environmentDue || gpsDue) {
+      sendBinaryFrame();
+    }
+  } else {
+    if (attitudeDue) {
+      updateMPU6050();
+    }
+    if (environmentDue) {
+      updateBMP280();
+    }
+    if (gpsDue) {
+      displayGPSInfo();
+    }
+  }
+}
+
+bool isDue(unsigned long interval, unsigned long &sent, unsigned long now) {
+  if (interval == 0 || now - sent < interval) {
+    return false;
+  }
+  sent = now;
+  return true;
+}
+
+void pollSerialPorts() {
+  unsigned long now = millis();
+  // Listen for commands from the end of a GPS burst until just before the next one
+  bool commandTime = now - gpsLastByte > GPS_QUIET && (now - gpsBurstStart) % GPS_PERIOD < GPS_PERIOD - GPS_GUARD;
+  if (commandTime != listeningForCommands) {
+    listeningForCommands = commandTime;
+    if (commandTime) {
+      hc12Serial.listen();
+      commandLength = 0;  // drop a command cut off by the last switch
+    } else {
+      gpsSerial.listen();
+    }
+  }
+
+  if (listeningForCommands) {
+    while (hc12Serial.available() > 0) {
+      readCommand(hc12Serial.read());
+    }
+  } else {
+    while (gpsSerial.available() > 0) {
+      if (now - gpsLastByte > GPS_QUIET) {
+        gpsBurstStart = now;
+      }
+      gpsLastByte = now;
+      gps.encode(gpsSerial.read());
+    }
+  }
+
+  // The USB port is hardware serial and always receives
+  while (Serial.available() > 0) {
+    readCommand(Serial.read());
+  }
+}
+
+void readCommand(char c) {
+  if (c == '\n' || c == '\r') {
+    if (commandLength > 0) {
+      commandLine[commandLength] = '\0';
+      handleCommand(commandLine);
+    }
+    commandLength = 0;
+  } else if (commandLength < COMMAND_LENGTH) {
+    commandLine[commandLength++] = c;
+  }
+}
+
+unsigned long *groupInterval(const char *group) {
+  if (group == NULL) {
+    return NULL;
+  }
+  if (strcmp(group, "ATT") == 0) {
+    return &attitudeInterval;
   }
+  if (strcmp(group, "ENV") == 0) {
+    return &environmentInterval;
+  }
+  if (strcmp(group, "GPS") == 0) {
+    return &gpsInterval;
+  }
+  return NULL;
+}
+
+void handleCommand(char *line) {
+  char command[COMMAND_LENGTH + 1];
+  strcpy(command, line);  // strtok() below cuts up `line`
+  const char *error = NULL;
 
-  // Update data every second
-  if ((millis() - timer) > 1000) {
-    updateMPU6050();
-    updateBMP280();
-    displayGPSInfo();  // Ensure GPS data is sent regularly
+  char *name = strtok(line, " ");
+  if (name != NULL && strcmp(name, "RATE") == 0) {
+    unsigned long *interval = groupInterval(strtok(NULL, " "));
+    char *value = strtok(NULL, " ");
+    if (interval == NULL || value == NULL) {
+      error = "usage: RATE ATT|ENV|GPS <Hz>";
+    } else {
+      float rate = atof(value);
+      if (rate < 0 || rate > MAX_RATE) {
+        error = "rate out of range";
+      } else {
+        *interval = rate > 0 ? (unsigned long)(1000.0 / rate + 0.5) : 0;
+      }
+    }
+  } else if (name != NULL && strcmp(name, "FORMAT") == 0) {
+    char *format = strtok(NULL, " ");
+    if (format != NULL && strcmp(format, "JSON") == 0) {
+      binaryTelemetry = false;
+    } else if (format != NULL && strcmp(format, "BINARY") == 0) {
+      binaryTelemetry = true;
+    } else {
+      error = "usage: FORMAT JSON|BINARY";
+    }
+  } else if (name == NULL || strcmp(name, "STATUS") != 0) {
+    error = "unknown command";
+  }
+  sendStatus(command, error);
+}
+
+float rateOf(unsigned long interval) {
+  return interval > 0 ? 1000.0 / interval : 0.0;
+}
 
-    // Update timer
-    timer = millis();
+void sendStatus(const char *command, const char *error) {
+  // Always JSON, so it can be read in Serial Monitor whatever the telemetry format
+  StaticJsonDocument<192> doc;
+  doc["ack"] = command;
+  if (error != NULL) {
+    doc["error"] = error;
   }
+  doc["att"] = rateOf(attitudeInterval);
+  doc["env"] = rateOf(environmentInterval);
+  doc["gps"] = rateOf(gpsInterval);
+  doc["format"] = binaryTelemetry ? "binary" : "json";
+
+  String output;
+  serializeJson(doc, output);
+  sendData(output);
 }
 
 void updateMPU6050() {
-  mpu.update();
-  
   // Read MPU6050 data
   float Yaw = mpu.getAngleZ();
   float Pitch = mpu.getAngleX();
@@ -97,12 +291,15 @@ void updateMPU6050() {
   sendData(output);
 }
 
+void readBMP280() {
+  temperature = bmp.readTemperature();
+  pressure = bmp.readPressure();
+  // Assumes standard sea level pressure; the ground station recomputes the
+  // altitude from the raw pressure with the local QNH
+  altitude = bmp.readAltitude(1013.25);
+}
+
 void updateBMP280() {
-  // Read BMP280 data
-  float temperature = bmp.readTemperature();
-  float pressure = bmp.readPressure();
-  float altitude = bmp.readAltitude(1013.25); // Assumes standard sea level pressure
-  
   // Create JSON object
   StaticJsonDocument<256> doc;
   doc["temperature"] = temperature;
@@ -147,6 +344,59 @@ void displayGPSInfo() {
   sendData(output);
 }
 
+uint16_t crc16(const uint8_t *data, size_t length) {
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 0; i < length; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (uint8_t bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+void sendBinaryFrame() {
+  TelemetryFrame frame;
+  memset(&frame, 0, sizeof(frame));
+  frame.sync[0] = FRAME_SYNC1;
+  frame.sync[1] = FRAME_SYNC2;
+  frame.version = FRAME_VERSION;
+  frame.seq = frameSeq++;
+  frame.uptimeMs = millis();
+
+  frame.yaw = mpu.getAngleZ();
+  frame.pitch = mpu.getAngleX();
+  frame.roll = mpu.getAngleY();
+
+  frame.temperature = temperature;
+  frame.pressure = pressure;
+  frame.altitude = altitude;
+
+  if (gps.location.isValid()) {
+    frame.flags |= FLAG_LOCATION_VALID;
+    frame.lat = (int32_t)(gps.location.lat() * 1e7);
+    frame.lng = (int32_t)(gps.location.lng() * 1e7);
+  }
+  if (gps.date.isValid()) {
+    frame.flags |= FLAG_DATE_VALID;
+    frame.year = gps.date.year();
+    frame.month = gps.date.month();
+    frame.day = gps.date.day();
+  }
+  if (gps.time.isValid()) {
+    frame.flags |= FLAG_TIME_VALID;
+    frame.hour = gps.time.hour();
+    frame.minute = gps.time.minute();
+    frame.second = gps.time.second();
+    frame.centisecond = gps.time.centisecond();
+  }
+
+  const uint8_t *bytes = (const uint8_t *)&frame;
+  frame.crc = crc16(bytes + 2, sizeof(frame) - 4);
+  Serial.write(bytes, sizeof(frame));
+  hc12Serial.write(bytes, sizeof(frame));
+}
+
 void sendData(const String &data) {
   Serial.println(data); // Print to Serial Monitor
   hc12Serial.println(data); // Send the data string via HC-12
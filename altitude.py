@@ -0,0 +1,37 @@
+import numpy as np
+
+# Barometric altitude from the raw pressure the CanSat sends, against a
+# reference sea-level pressure (QNH) the operator can change at any time.
+# Same formula as Adafruit_BMP280::readAltitude(), which the can itself uses
+# with the standard 1013.25 hPa.
+
+STANDARD_QNH = 1013.25  # hPa
+EXPONENT = 0.1903
+SCALE_HEIGHT = 44330.0  # m
+CALIBRATION_WINDOW = 10.0  # seconds of pre-launch readings used by calibrate_qnh()
+
+
+def pressure_altitude(pressure, qnh=STANDARD_QNH):
+    # Pressure in Pa, a scalar or an array; QNH in hPa
+    return SCALE_HEIGHT * (1.0 - np.power(np.asarray(pressure, dtype=np.float64) / (100.0 * qnh), EXPONENT))
+
+
+def qnh_for(pressure, elevation=0.0):
+    # The QNH that puts `pressure` (Pa) at `elevation` metres
+    return pressure / 100.0 / (1.0 - elevation / SCALE_HEIGHT) ** (1.0 / EXPONENT)
+
+
+def calibrate_qnh(pressures, elevation=0.0):
+    # From readings taken on the pad; the median ignores the odd spike
+    pressures = np.asarray(pressures, dtype=np.float64)
+    pressures = pressures[np.isfinite(pressures)]
+    if not len(pressures):
+        raise ValueError("No pressure readings to calibrate from")
+    return float(qnh_for(np.median(pressures), elevation))
+
+
+def altitude_transform(old_qnh, new_qnh):
+    # Altitudes for one QNH map exactly onto another by h' = offset + scale * h,
+    # so recalibrating never needs the pressure again
+    scale = (old_qnh / new_qnh) ** EXPONENT
+    return SCALE_HEIGHT * (1.0 - scale), scale
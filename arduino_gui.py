@@ -1,17 +1,75 @@
 import sys
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QGraphicsOpacityEffect, QApplication
-from PyQt5.QtCore import Qt, QPropertyAnimation, QEasingCurve, QTimer
-from PyQt5.QtGui import QColor
+import threading
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QGraphicsOpacityEffect, QApplication,
+                             QShortcut, QFileDialog, QComboBox, QDialog, QFormLayout, QLineEdit, QDialogButtonBox)
+from PyQt5.QtCore import Qt, QPropertyAnimation, QEasingCurve, QTimer, pyqtSignal
+from PyQt5.QtGui import QColor, QKeySequence
 import pyqtgraph as pg
-import serial
-import json
-from datetime import datetime, timedelta
+import numpy as np
+from render_scheduler import RenderScheduler, DEFAULT_DISPLAY_RATE
+from metrics import Metrics
+from estimators import EstimatorEngine
+from receivers import ReceiverGroup
+from commands import RATE_PRESETS
+from mission_export import export_mission, parse_fields
+from mission_log import COLUMNS
+
+CURVE_COLORS = {"yaw": 'r', "pitch": 'g', "roll": 'b'}
+FOLLOW_WINDOW = 60.0  # seconds shown by "Last 60 s"
+
+class ExportDialog(QDialog):
+    # Which recorded mission to export, which fields and which part of it
+    def __init__(self, mission_path, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Export Mission")
+        self.setStyleSheet("color: yellow; background-color: black;")
+        layout = QFormLayout(self)
+
+        mission_row = QHBoxLayout()
+        self.mission_edit = QLineEdit(mission_path)
+        mission_row.addWidget(self.mission_edit)
+        browse_button = QPushButton("Browse")
+        browse_button.clicked.connect(self.browse_mission)
+        mission_row.addWidget(browse_button)
+        layout.addRow("Mission:", mission_row)
+
+        self.fields_edit = QLineEdit()
+        self.fields_edit.setPlaceholderText("All: " + ", ".join(COLUMNS))
+        layout.addRow("Fields:", self.fields_edit)
+
+        # Mission seconds; empty means from the start or to the end
+        self.start_edit = QLineEdit()
+        layout.addRow("From (s):", self.start_edit)
+        self.end_edit = QLineEdit()
+        layout.addRow("To (s):", self.end_edit)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addRow(button_box)
+
+    def browse_mission(self):
+        path = QFileDialog.getExistingDirectory(self, "Select Mission Recording", self.mission_edit.text())
+        if path:
+            self.mission_edit.setText(path)
+
+    def get_options(self):
+        return {
+            "mission_path": self.mission_edit.text(),
+            "fields": parse_fields(self.fields_edit.text()),
+            "start": float(self.start_edit.text()) if self.start_edit.text() else None,
+            "end": float(self.end_edit.text()) if self.end_edit.text() else None
+        }
 
 class ArduinoGUI(QWidget):
+    # Emitted from the reader thread; Qt queues it onto the GUI thread
+    frames_ready = pyqtSignal()
+
     def __init__(self, main_window, settings):
         super().__init__()
         self.main_window = main_window
         self.settings = settings
+        self.metrics = Metrics()
         self.setStyleSheet("color: yellow; background-color: black;")
 
         self.layout = QVBoxLayout(self)
@@ -33,7 +91,21 @@ class ArduinoGUI(QWidget):
             }
         """)
         self.back_button.clicked.connect(self.go_back_to_menu)
-        self.layout.addWidget(self.back_button, alignment=Qt.AlignLeft | Qt.AlignTop)
+        top_row = QHBoxLayout()
+        top_row.addWidget(self.back_button, alignment=Qt.AlignLeft | Qt.AlignTop)
+
+        # State of every serial receiver; ports reconnect by themselves
+        self.link_label = QLabel("")
+        self.link_label.setStyleSheet("font-size: 18px; margin-left: 20px;")
+        top_row.addWidget(self.link_label, alignment=Qt.AlignLeft | Qt.AlignTop)
+        top_row.addStretch()
+
+        # With several receivers: which can, merged or through which receiver, is shown
+        self.view_combo = QComboBox()
+        self.view_combo.setStyleSheet("font-size: 18px; border: 2px solid yellow; padding: 5px;")
+        self.view_combo.currentTextChanged.connect(self.select_view)
+        top_row.addWidget(self.view_combo, alignment=Qt.AlignRight | Qt.AlignTop)
+        self.layout.addLayout(top_row)
 
         main_content = QHBoxLayout()
 
@@ -51,9 +123,15 @@ class ArduinoGUI(QWidget):
             "altitude": QLabel("Altitude: N/A"),
             "location": QLabel("Location: Signal not available"),
             "date_time_gmt": QLabel("Date/Time (GMT): Signal not available"),
-            "date_time_pkt": QLabel("Date/Time (PKT): Signal not available")
+            "date_time_pkt": QLabel("Date/Time (PKT): Signal not available"),
+            "link": QLabel("Transmit Rates: N/A")
         }
 
+        # One label per derived quantity; plotted estimator outputs get a curve instead
+        estimators = EstimatorEngine()
+        for key in estimators.outputs(plot=False):
+            self.data_labels[key] = QLabel(f"{estimators.label(key)}: N/A")
+
         for label in self.data_labels.values():
             label.setStyleSheet("font-size: 24px; margin: 10px;")
             data_layout.addWidget(label)
@@ -68,19 +146,38 @@ class ArduinoGUI(QWidget):
         self.graph.setBackground('k')
         self.graph.setTitle("Yaw, Pitch, Roll", color='y', size='24pt')
         self.graph.setLabel('left', 'Degrees', color='y', size='20pt')
-        self.graph.setLabel('bottom', 'Time', color='y', size='20pt')
+        self.graph.setLabel('bottom', 'Mission Time (s)', color='y', size='20pt')
         self.graph.showGrid(x=True, y=True)
         self.graph.addLegend()
 
         self.yaw_curve = self.graph.plot(pen='r', name='Yaw')
         self.pitch_curve = self.graph.plot(pen='g', name='Pitch')
         self.roll_curve = self.graph.plot(pen='b', name='Roll')
+        self.curves = {"yaw": self.yaw_curve, "pitch": self.pitch_curve, "roll": self.roll_curve}
+        # Filtered attitude is dashed in the colour of its channel
+        for key in estimators.outputs(plot=True):
+            pen = pg.mkPen(CURVE_COLORS.get(key.split("_")[0], 'w'), style=Qt.DashLine)
+            self.curves[key] = self.graph.plot(pen=pen, name=estimators.label(key))
 
-        graph_layout.addWidget(self.graph)
+        # Ground track on a plain metre grid, so no map tiles are needed
+        self.track_plot = pg.PlotWidget()
+        self.track_plot.setBackground('k')
+        self.track_plot.setTitle("Ground Track", color='y', size='18pt')
+        self.track_plot.setLabel('left', 'North (m)', color='y')
+        self.track_plot.setLabel('bottom', 'East (m)', color='y')
+        self.track_plot.showGrid(x=True, y=True)
+        self.track_plot.setAspectLocked(True)
+        self.track_curve = self.track_plot.plot(pen='y')
+        self.track_start = self.track_plot.plot(symbol='s', symbolBrush='g', symbolSize=10, pen=None)
+        self.track_position = self.track_plot.plot(symbol='o', symbolBrush='r', symbolSize=12, pen=None)
 
-        # Refresh button
-        self.refresh_button = QPushButton("Refresh Graph")
-        self.refresh_button.setStyleSheet("""
+        plots_row = QHBoxLayout()
+        plots_row.addWidget(self.graph, 3)
+        plots_row.addWidget(self.track_plot, 2)
+        graph_layout.addLayout(plots_row)
+
+        # Refresh, diagnostics and metrics export buttons
+        button_style = """
             QPushButton {
                 background-color: yellow;
                 color: black;
@@ -93,105 +190,270 @@ class ArduinoGUI(QWidget):
                 background-color: black;
                 color: yellow;
             }
-        """)
+        """
+        button_row = QHBoxLayout()
+        button_row.setAlignment(Qt.AlignCenter)
+
+        self.refresh_button = QPushButton("Refresh Graph")
+        self.refresh_button.setStyleSheet(button_style)
         self.refresh_button.clicked.connect(self.refresh_graph)
-        graph_layout.addWidget(self.refresh_button, alignment=Qt.AlignCenter)
+        button_row.addWidget(self.refresh_button)
+
+        self.diagnostics_button = QPushButton("Diagnostics (F3)")
+        self.diagnostics_button.setStyleSheet(button_style)
+        self.diagnostics_button.clicked.connect(self.toggle_diagnostics)
+        button_row.addWidget(self.diagnostics_button)
+
+        # Keeps the x-axis on the newest FOLLOW_WINDOW seconds
+        self.follow_button = QPushButton(f"Last {FOLLOW_WINDOW:.0f} s")
+        self.follow_button.setStyleSheet(button_style + "QPushButton:checked { background-color: black; color: yellow; }")
+        self.follow_button.setCheckable(True)
+        self.follow_button.toggled.connect(lambda: self.renderer.mark_curve("attitude"))
+        button_row.addWidget(self.follow_button)
+
+        # Commands the can's transmit rates; custom rates are set in Options
+        for name in RATE_PRESETS:
+            preset_button = QPushButton(f"{name} Rates")
+            preset_button.setStyleSheet(button_style)
+            preset_button.clicked.connect(lambda checked, name=name: self.apply_rate_preset(name))
+            button_row.addWidget(preset_button)
+        # After a timeout, or to see what the can is actually sending
+        self.resend_button = QPushButton("Resend Rates")
+        self.resend_button.setStyleSheet(button_style)
+        self.resend_button.clicked.connect(self.resend_rates)
+        button_row.addWidget(self.resend_button)
+
+        # Takes the last few seconds on the pad as the field elevation set in Options
+        self.calibrate_button = QPushButton("Calibrate QNH")
+        self.calibrate_button.setStyleSheet(button_style)
+        self.calibrate_button.clicked.connect(self.calibrate_qnh)
+        button_row.addWidget(self.calibrate_button)
+
+        self.export_mission_button = QPushButton("Export Mission")
+        self.export_mission_button.setStyleSheet(button_style)
+        self.export_mission_button.clicked.connect(self.export_mission)
+        button_row.addWidget(self.export_mission_button)
+
+        self.export_metrics_button = QPushButton("Export Metrics")
+        self.export_metrics_button.setStyleSheet(button_style)
+        self.export_metrics_button.clicked.connect(self.export_metrics)
+        button_row.addWidget(self.export_metrics_button)
+
+        graph_layout.addLayout(button_row)
+
+        # Diagnostics overlay drawn on top of the graph, refreshed once per second while visible
+        self.diagnostics_overlay = QLabel(self.graph)
+        self.diagnostics_overlay.setStyleSheet(
+            "font-family: monospace; font-size: 14px; color: yellow; "
+            "background-color: rgba(0, 0, 0, 200); border: 1px solid yellow; padding: 6px;")
+        self.diagnostics_overlay.move(60, 40)
+        self.diagnostics_overlay.hide()
+        self.diagnostics_shortcut = QShortcut(QKeySequence("F3"), self)
+        self.diagnostics_shortcut.activated.connect(self.toggle_diagnostics)
+        self.diagnostics_snapshot = None
+        self.diagnostics_timer = QTimer(self)
+        self.diagnostics_timer.timeout.connect(self.update_diagnostics)
 
         main_content.addWidget(graph_widget)
         self.layout.addLayout(main_content)
 
-        # Set up data
-        self.time_data = []
-        self.yaw_data = []
-        self.pitch_data = []
-        self.roll_data = []
+        # Decoding, state, history and recording live in GUI-independent pipelines,
+        # one per can and per receiver; self.pipeline is the one on screen
+        self.receivers = ReceiverGroup(self.metrics)
+        self.pipeline = None
 
         # Set up fade effect
         self.opacity_effect = QGraphicsOpacityEffect(self)
         self.setGraphicsEffect(self.opacity_effect)
         self.opacity_effect.setOpacity(0)
 
-        # Set up serial connection
-        self.setup_serial_connection()
+        # Widgets are repainted at a fixed display rate, independent of the ingest rate
+        self.renderer = RenderScheduler(self.settings.get("display_rate", DEFAULT_DISPLAY_RATE), self, self.metrics)
+        self.renderer.register_curve("attitude", self.update_curves)
+        self.graph.getViewBox().sigXRangeChanged.connect(lambda: self.renderer.mark_curve("attitude"))
+        self.renderer.register_curve("track", self.update_track)
+        self.track_plot.getViewBox().sigRangeChanged.connect(lambda: self.renderer.mark_curve("track"))
 
-        self.buffer = ""
-        self.previous_values = {key: "N/A" for key in self.data_labels.keys()}
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.read_serial_data)
-        self.timer.start(100)  # Check for new data every 100ms
+        # Set up the telemetry sources; records arrive from background threads
+        self.frames_ready.connect(self.read_serial_data)
+        if QApplication.instance() is not None:
+            QApplication.instance().aboutToQuit.connect(self.receivers.stop_recording)
+        # A receiver that comes back is reattached as soon as the port scanner sees it
+        port_scanner = getattr(main_window, "port_scanner", None)
+        if port_scanner is not None:
+            port_scanner.ports_changed.connect(self.receivers.reattach)
+        self.setup_sources()
 
-    def setup_serial_connection(self):
-        try:
-            self.serial_port = serial.Serial(self.settings["com_port"], self.settings["baud_rate"])
-            print(f"Connected to {self.settings['com_port']} at {self.settings['baud_rate']} baud")
-        except serial.SerialException as e:
-            print(f"Serial port error: {e}")
-            # You might want to show an error message to the user here
+    def setup_sources(self):
+        self.receivers.configure(self.settings, self.frames_ready.emit)
+        self.update_views()
+        self.show_link_states()
+
+    def show_link_states(self):
+        states = self.receivers.link_states()
+        text = "Link: " + ", ".join(f"{port} {state}" for port, state in states) if states else "Replay"
+        self.renderer.set_label(self.link_label, text)
+
+    def update_views(self):
+        views = self.receivers.views()
+        current = self.view_combo.currentText()
+        self.view_combo.blockSignals(True)
+        self.view_combo.clear()
+        self.view_combo.addItems([label for label, _ in views])
+        self.view_combo.blockSignals(False)
+        self.view_combo.setVisible(len(views) > 1)
+        labels = [label for label, _ in views]
+        self.select_view(current if current in labels else labels[0])
+
+    def select_view(self, label):
+        if not label:
+            return
+        self.view_combo.setCurrentText(label)
+        self.pipeline = dict(self.receivers.views())[label]
+        # Everything on screen now comes from another pipeline
+        self.pipeline.changed.update(list(self.pipeline.previous_values) + ["sample", "track"])
+        self.show_changes()
 
     def update_settings(self, new_settings):
+        # Receivers whose port and settings are unchanged keep running
         self.settings = new_settings
-        if hasattr(self, 'serial_port'):
-            self.serial_port.close()
-        self.setup_serial_connection()
+        self.renderer.set_display_rate(self.settings.get("display_rate", DEFAULT_DISPLAY_RATE))
+        self.setup_sources()
+        self.renderer.mark_curve("attitude")
 
-    def read_serial_data(self):
-        try:
-            if self.serial_port.in_waiting > 0:
-                self.buffer += self.serial_port.read(self.serial_port.in_waiting).decode('utf-8')
-                lines = self.buffer.split('\n')
-                for line in lines:
-                    if line.strip():
-                        print(f"Raw data received: {line.strip()}")  # Print raw data for debugging
-                        self.parse_data(line.strip())
-                self.buffer = ""
-        except Exception as e:
-            print(f"Error reading serial data: {e}")
-
-    def parse_data(self, data):
+    def apply_rate_preset(self, name):
+        # Kept in the settings, so Options shows the rates the can was sent
+        self.settings.update(RATE_PRESETS[name])
+        self.receivers.sync_link()
+        print(f"Transmit rates: {name.lower()} preset sent")
+
+    def resend_rates(self):
+        self.receivers.sync_link(resend=True)
+        print("Transmit rates: sent again")
+
+    def calibrate_qnh(self):
         try:
-            print(f"Parsing data: {data}")  # Print data being parsed for debugging
-            json_data = json.loads(data)
-
-            for key in ["yaw", "pitch", "roll", "temperature", "pressure", "altitude", "location"]:
-                if key in json_data:
-                    self.previous_values[key] = json_data[key]
-                    self.data_labels[key].setText(f"{key.capitalize()}: {self.previous_values[key]}")
-
-            if "date" in json_data and "time" in json_data:
-                gmt_time = datetime.strptime(f"{json_data['date']} {json_data['time']}", "%m/%d/%Y %H:%M:%S.%f")
-                pkt_time = gmt_time + timedelta(hours=5)
-                self.previous_values["date_time_gmt"] = gmt_time.strftime("%m/%d/%Y %H:%M:%S.%f")
-                self.previous_values["date_time_pkt"] = pkt_time.strftime("%m/%d/%Y %H:%M:%S.%f")
-
-                self.data_labels["date_time_gmt"].setText(f"Date/Time (GMT): {self.previous_values['date_time_gmt']}")
-                self.data_labels["date_time_pkt"].setText(f"Date/Time (PKT): {self.previous_values['date_time_pkt']}")
-
-            # Update graph
-            self.time_data.append(len(self.time_data))
-            self.yaw_data.append(float(self.previous_values["yaw"]))
-            self.pitch_data.append(float(self.previous_values["pitch"]))
-            self.roll_data.append(float(self.previous_values["roll"]))
-
-            self.yaw_curve.setData(self.time_data, self.yaw_data)
-            self.pitch_curve.setData(self.time_data, self.pitch_data)
-            self.roll_curve.setData(self.time_data, self.roll_data)
-
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error: {e}")
-        except Exception as e:
-            print(f"Error parsing data: {e}")
+            qnh = self.pipeline.calibrate(self.settings.get("field_elevation", 0.0))
+        except ValueError as e:
+            print(f"Calibration error: {e}")
+            return
+        # Every can and receiver shares the launch site's QNH; Options shows it from now on
+        self.settings["qnh"] = qnh
+        self.receivers.set_qnh(qnh)
+        self.show_changes()
+        print(f"QNH calibrated to {qnh:.2f} hPa")
+
+    def read_serial_data(self):
+        # Only consumes records the source threads have already framed and decoded
+        self.receivers.drain()
+        self.show_changes()
+        self.show_link_states()
+
+    def parse_data(self, json_data):
+        self.pipeline.process(json_data)
+        self.show_changes()
+
+    def show_changes(self):
+        # Hand whatever changed to the render scheduler; it repaints at the display rate
+        for key in self.pipeline.take_changes():
+            if key == "sample":
+                self.renderer.mark_curve("attitude")
+            elif key == "track":
+                self.renderer.mark_curve("track")
+            elif key in self.data_labels:
+                self.renderer.set_label(self.data_labels[key], self.pipeline.label_text(key))
+
+    def update_curves(self):
+        # Draw about one min/max pair per pixel column of the visible range;
+        # zoomed-in views get views into the ring buffers at full resolution
+        view_box = self.graph.getViewBox()
+        store = self.pipeline.store
+        if self.follow_button.isChecked() and len(store):
+            x1 = store.last("time")
+            x0 = x1 - FOLLOW_WINDOW
+            view_box.setXRange(x0, x1, padding=0)
+        elif view_box.autoRangeEnabled()[0]:
+            x0, x1 = -np.inf, np.inf
+        else:
+            x0, x1 = view_box.viewRange()[0]
+        max_points = max(int(view_box.width()), 1)
+        times = store.view("time")
+        for name, curve in self.curves.items():
+            curve.setData(*self.pipeline.pyramids[name].query(x0, x1, max_points, times, store.view(name)))
+
+    def update_track(self):
+        # Thinned to about one point per PIXEL_TOLERANCE pixels at the current zoom
+        track = self.pipeline.track
+        view_box = self.track_plot.getViewBox()
+        x0, x1 = view_box.viewRange()[0]
+        x, y = track.query((x1 - x0) / max(view_box.width(), 1))
+        self.track_curve.setData(x, y)
+        if len(track):
+            self.track_start.setData([0.0], [0.0])
+            self.track_position.setData([x[-1]], [y[-1]])
+            self.track_plot.setTitle(f"Ground Track: {track.distance():.0f} m from first fix", color='y', size='18pt')
+        else:
+            self.track_start.clear()
+            self.track_position.clear()
+            self.track_plot.setTitle("Ground Track", color='y', size='18pt')
 
     def refresh_graph(self):
         # Clear the existing data and reset the graph
-        self.time_data.clear()
-        self.yaw_data.clear()
-        self.pitch_data.clear()
-        self.roll_data.clear()
-        self.yaw_curve.clear()
-        self.pitch_curve.clear()
-        self.roll_curve.clear()
+        self.receivers.clear()
+        for curve in self.curves.values():
+            curve.clear()
+        self.renderer.mark_curve("track")
         print("Graph refreshed")
 
+    def toggle_diagnostics(self):
+        if self.diagnostics_overlay.isVisible():
+            self.diagnostics_timer.stop()
+            self.diagnostics_overlay.hide()
+        else:
+            self.update_diagnostics()
+            self.diagnostics_overlay.show()
+            self.diagnostics_overlay.raise_()
+            self.diagnostics_timer.start(1000)
+
+    def update_diagnostics(self):
+        self.diagnostics_overlay.setText(self.metrics.format(self.diagnostics_snapshot))
+        self.diagnostics_overlay.adjustSize()
+        self.diagnostics_snapshot = self.metrics.snapshot()
+
+    def export_metrics(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Metrics", "metrics.json", "JSON (*.json)")
+        if path:
+            self.metrics.export(path)
+            print(f"Metrics exported to {path}")
+
+    def export_mission(self):
+        # Defaults to the mission being recorded or replayed
+        recorder = self.pipeline.recorder
+        mission_path = recorder.path if recorder is not None else self.settings.get("replay_path", "")
+        dialog = ExportDialog(mission_path, self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        try:
+            options = dialog.get_options()
+        except ValueError as e:
+            print(f"Export error: {e}")
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Export Mission", "mission.csv", "CSV (*.csv);;NumPy (*.npz)")
+        if not path:
+            return
+        if recorder is not None and recorder.path == options["mission_path"]:
+            recorder.flush()
+        # Long missions take a while; the export streams from disk on its own thread
+        threading.Thread(target=self.run_export, args=(options, path), daemon=True).start()
+
+    def run_export(self, options, path):
+        try:
+            rows = export_mission(options["mission_path"], path, options["fields"], options["start"], options["end"])
+        except (OSError, ValueError) as e:
+            print(f"Export error: {e}")
+            return
+        print(f"Exported {rows} rows to {path}")
+
     def fade_in(self):
         self.animation = QPropertyAnimation(self.opacity_effect, b"opacity")
         self.animation.setDuration(1000)
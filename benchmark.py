@@ -0,0 +1,221 @@
+import argparse
+import contextlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+import numpy as np
+from simulator import CanSatSimulator, open_pty
+from serial_reader import SerialReader
+from telemetry_core import TelemetryPipeline
+from mission_log import MissionRecorder
+from settings import PROTOCOLS
+
+# Measures how fast each ingest and render stage can go on simulated
+# telemetry: sustained frames per second, per-frame latency percentiles,
+# frames lost and memory growth.
+
+CHUNK_SIZE = 256  # bytes per simulated serial read
+
+
+def simulated_stream(protocol, updates, corruption=0.0, seed=1):
+    simulator = CanSatSimulator(protocol, corruption=corruption, seed=seed)
+    messages = [m for tick in range(updates) for m in simulator.messages(tick * 0.1)]
+    data = simulator.corrupt(b"".join(messages))
+    return data, len(messages)
+
+
+def records_for(updates):
+    reader = SerialReader(None)
+    data, _ = simulated_stream("json", updates)
+    with quiet():
+        return reader.decode_json(data)
+
+
+@contextlib.contextmanager
+def quiet():
+    # Stages may print per line; keep that cost but not the output
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def run_stage(make_step, batches):
+    # make_step() returns a fresh callable taking one batch and returning the
+    # number of frames it produced; the stage runs twice, once for timing and
+    # once under tracemalloc for memory growth.
+    step = make_step()
+    latencies, frames = [], 0
+    with quiet():
+        start = time.perf_counter()
+        for batch in batches:
+            t0 = time.perf_counter()
+            produced = step(batch)
+            latencies.append((time.perf_counter() - t0) / max(produced, 1))
+            frames += produced
+        elapsed = time.perf_counter() - start
+
+        step = make_step()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for batch in batches:
+            step(batch)
+        growth = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+    return frames, elapsed, latencies, growth
+
+
+def chunks(data):
+    return [data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)]
+
+
+def bench_decode(protocol, updates, corruption):
+    data, sent = simulated_stream(protocol, updates, corruption)
+
+    def make_step():
+        reader = SerialReader(None, max_frames=sent + 1, protocol=protocol)
+        return lambda chunk: reader.handle_chunk(chunk, 0.0)
+
+    return (f"decode ({protocol})", sent) + run_stage(make_step, chunks(data))
+
+
+def bench_pipeline(updates):
+    records = records_for(updates)
+    batches = [records[i:i + 64] for i in range(0, len(records), 64)]
+
+    def make_step():
+        pipeline = TelemetryPipeline({})
+
+        def step(batch):
+            for record in batch:
+                pipeline.process(record)
+            return len(batch)
+        return step
+
+    return ("pipeline (state + store)", len(records)) + run_stage(make_step, batches)
+
+
+def bench_recorder(updates):
+    records = records_for(updates)
+    batches = [records[i:i + 64] for i in range(0, len(records), 64)]
+    directory = tempfile.mkdtemp()
+
+    def make_step():
+        recorder = MissionRecorder(tempfile.mkdtemp(dir=directory))
+
+        def step(batch):
+            for record in batch:
+                recorder.append(time.monotonic(), record)
+            return len(batch)
+        return step
+
+    try:
+        return ("recorder", len(records)) + run_stage(make_step, batches)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_dashboard(updates):
+    # Needs PyQt5; runs offscreen
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([])
+    from arduino_gui import ArduinoGUI
+
+    records = records_for(updates)
+    batches = [records[i:i + 64] for i in range(0, len(records), 64)]
+
+    def make_step():
+        gui = ArduinoGUI(None, {"com_port": "", "baud_rate": 9600})
+        gui.renderer.stop()
+
+        def step(batch):
+            for record in batch:
+                gui.parse_data(record)
+            gui.renderer.render()
+            app.processEvents()
+            return len(batch)
+        return step
+
+    return ("dashboard parse + render", len(records)) + run_stage(make_step, batches)
+
+
+def bench_end_to_end(protocol, rate, duration, corruption, burst):
+    # Simulator -> pseudo-terminal -> SerialReader thread -> consumer
+    import serial
+    master, slave, name = open_pty()
+    port = serial.Serial(name, 9600, timeout=0.5)
+    sent_times, latencies = [], []
+    frames_ready = threading.Event()
+    reader = SerialReader(port, on_frames=frames_ready.set, max_frames=1000, protocol=protocol)
+    simulator = CanSatSimulator(protocol, corruption=corruption, seed=1)
+
+    def on_sent(count, sent_at):
+        sent_times.extend([sent_at] * count)
+
+    def collect():
+        # Latency is matched by arrival order, so it is exact only without lost frames
+        now = time.monotonic()
+        for _ in reader.drain():
+            if len(latencies) < len(sent_times):
+                latencies.append(now - sent_times[len(latencies)])
+
+    def consume():
+        while reader.running.is_set():
+            if frames_ready.wait(0.1):
+                frames_ready.clear()
+                collect()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    with quiet():
+        reader.start()
+        consumer = threading.Thread(target=consume, daemon=True)
+        consumer.start()
+        start = time.perf_counter()
+        simulator.stream(lambda data: os.write(master, data), rate, duration, burst, on_sent=on_sent)
+        time.sleep(0.5)  # let the reader catch up
+        elapsed = time.perf_counter() - start
+        reader.stop()
+        consumer.join(timeout=1)
+        collect()
+    growth = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    port.close()
+    os.close(master)
+    return (f"end-to-end ({protocol})", len(sent_times), len(latencies), elapsed, latencies, growth)
+
+
+def report(results):
+    print(f"{'stage':<26}{'frames':>9}{'lost':>7}{'frames/s':>12}{'p50 us':>10}{'p95 us':>10}{'p99 us':>10}{'mem KiB':>10}")
+    for name, sent, frames, elapsed, latencies, growth in results:
+        p50, p95, p99 = np.percentile(np.asarray(latencies) * 1e6, [50, 95, 99]) if latencies else (np.nan,) * 3
+        print(f"{name:<26}{frames:>9}{sent - frames:>7}{frames / elapsed:>12.0f}"
+              f"{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{growth / 1024:>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ground station ingest and render stages")
+    parser.add_argument("--updates", type=int, default=5000, help="simulated updates per offline stage")
+    parser.add_argument("--corruption", type=float, default=0.0, help="probability of corrupting each byte")
+    parser.add_argument("--gui", action="store_true", help="also benchmark the dashboard (needs PyQt5)")
+    parser.add_argument("--live", action="store_true", help="also run end-to-end over a pseudo-terminal")
+    parser.add_argument("--rate", type=float, default=200.0, help="updates per second for --live")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds for --live")
+    parser.add_argument("--burst", type=float, default=0.0, help="burstiness for --live")
+    args = parser.parse_args(argv)
+
+    results = [bench_decode(protocol, args.updates, args.corruption) for protocol in PROTOCOLS]
+    results.append(bench_pipeline(args.updates))
+    results.append(bench_recorder(args.updates))
+    if args.gui:
+        results.append(bench_dashboard(args.updates))
+    if args.live:
+        for protocol in PROTOCOLS:
+            results.append(bench_end_to_end(protocol, args.rate, args.duration, args.corruption, args.burst))
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
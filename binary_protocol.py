@@ -0,0 +1,206 @@
+import binascii
+from datetime import datetime, timezone
+import numpy as np
+
+# Fixed-layout little-endian frame sent by CanSat.ino when binary telemetry
+# is enabled. Must match `struct TelemetryFrame` in the sketch.
+SYNC = b"\xaa\x55"
+FRAME_VERSION = 1
+
+FLAG_LOCATION_VALID = 0x01
+FLAG_DATE_VALID = 0x02
+FLAG_TIME_VALID = 0x04
+
+FRAME_DTYPE = np.dtype([
+    ("sync", "u1", 2),
+    ("version", "u1"),
+    ("flags", "u1"),
+    ("seq", "<u2"),
+    ("millis", "<u4"),
+    ("yaw", "<f4"),
+    ("pitch", "<f4"),
+    ("roll", "<f4"),
+    ("temperature", "<f4"),
+    ("pressure", "<f4"),
+    ("altitude", "<f4"),
+    ("lat", "<i4"),  # degrees * 1e7
+    ("lng", "<i4"),
+    ("year", "<u2"),
+    ("month", "u1"),
+    ("day", "u1"),
+    ("hour", "u1"),
+    ("minute", "u1"),
+    ("second", "u1"),
+    ("centisecond", "u1"),
+    ("crc", "<u2"),
+])
+FRAME_SIZE = FRAME_DTYPE.itemsize
+
+# The CRC covers everything between the sync bytes and the CRC itself
+CRC_START = 2
+CRC_END = FRAME_SIZE - 2
+# Buffers and batches of up to this many frames are checked one frame at a
+# time; the column-wise work only pays off for a backlog or a file
+SCALAR_FRAMES = 16
+
+
+def make_crc_table():
+    # CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF)
+    table = np.zeros(256, dtype=np.uint16)
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table[byte] = crc & 0xFFFF
+    return table
+
+
+CRC_TABLE = make_crc_table()
+
+
+def crc_ccitt(data):
+    # CRC-16/CCITT-FALSE of a bytes-like object: binascii.crc_hqx started at 0xFFFF
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def crc16(rows):
+    # One CRC per row. Large batches are computed column by column so the work
+    # is vectorized across frames.
+    if len(rows) <= SCALAR_FRAMES:
+        return np.array([crc_ccitt(row[CRC_START:CRC_END].tobytes()) for row in rows], dtype=np.uint16)
+    crc = np.full(len(rows), 0xFFFF, dtype=np.uint16)
+    for column in range(CRC_START, CRC_END):
+        crc = (crc << 8) ^ CRC_TABLE[(crc >> 8) ^ rows[:, column]]
+    return crc
+
+
+def decode_frames(buffer):
+    # Returns (frames, consumed, discarded): a structured array of every
+    # valid frame in `buffer`, how many leading bytes the caller can drop,
+    # and how many of those were garbage rather than frames.
+    if len(buffer) <= SCALAR_FRAMES * FRAME_SIZE:
+        return decode_small(buffer)
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    empty = np.zeros(0, dtype=FRAME_DTYPE)
+    if len(data) < 2:
+        return empty, 0, 0
+
+    starts = np.flatnonzero((data[:-1] == SYNC[0]) & (data[1:] == SYNC[1]))
+    complete = starts[starts + FRAME_SIZE <= len(data)]
+    incomplete = starts[starts + FRAME_SIZE > len(data)]
+
+    frames = empty
+    if len(complete):
+        rows = data[complete[:, None] + np.arange(FRAME_SIZE)]
+        crc = rows[:, CRC_END].astype(np.uint16) | (rows[:, CRC_END + 1].astype(np.uint16) << 8)
+        valid = (crc16(rows) == crc) & (rows[:, 2] == FRAME_VERSION)
+        complete, rows = complete[valid], rows[valid]
+        # A sync pattern inside an accepted frame cannot start another one
+        if len(complete) > 1 and np.any(np.diff(complete) < FRAME_SIZE):
+            keep, end = [], 0
+            for i, start in enumerate(complete):
+                if start >= end:
+                    keep.append(i)
+                    end = start + FRAME_SIZE
+            complete, rows = complete[keep], rows[keep]
+        frames = np.ascontiguousarray(rows).view(FRAME_DTYPE).ravel()
+
+    # Keep the first partial frame, or a trailing sync byte, for the next read
+    end = int(complete[-1]) + FRAME_SIZE if len(complete) else 0
+    pending = incomplete[incomplete >= end]
+    if len(pending):
+        consumed = int(pending[0])
+    elif data[-1] == SYNC[0]:
+        consumed = len(data) - 1
+    else:
+        consumed = len(data)
+    consumed = max(consumed, end)
+    return frames, consumed, consumed - len(frames) * FRAME_SIZE
+
+
+def decode_small(buffer):
+    # decode_frames for the few frames of a typical serial read, without the
+    # fixed cost of the numpy calls. Same results, one sync pattern at a time.
+    rows, end, pending = [], 0, None
+    start = buffer.find(SYNC)
+    while start >= 0:
+        if start + FRAME_SIZE > len(buffer):
+            if start >= end:
+                pending = start
+                break
+        elif start >= end and buffer[start + 2] == FRAME_VERSION and \
+                crc_ccitt(buffer[start + CRC_START:start + CRC_END]) == \
+                int.from_bytes(buffer[start + CRC_END:start + FRAME_SIZE], "little"):
+            rows.append(buffer[start:start + FRAME_SIZE])
+            end = start + FRAME_SIZE
+        start = buffer.find(SYNC, start + 1)
+
+    frames = np.frombuffer(b"".join(rows), dtype=FRAME_DTYPE) if rows else np.zeros(0, dtype=FRAME_DTYPE)
+    # Keep the first partial frame, or a trailing sync byte, for the next read
+    if pending is not None:
+        consumed = pending
+    elif buffer[-1:] == SYNC[:1]:
+        consumed = len(buffer) - 1
+    else:
+        consumed = len(buffer)
+    consumed = max(consumed, end)
+    return frames, consumed, consumed - len(rows) * FRAME_SIZE
+
+
+def encode_frame(seq, millis, values, flags=0, date=(0, 0, 0), time=(0, 0, 0, 0)):
+    # Builds one frame the way the sketch does; used by tools that need sample frames
+    frame = np.zeros(1, dtype=FRAME_DTYPE)
+    frame["sync"] = np.frombuffer(SYNC, dtype=np.uint8)
+    frame["version"] = FRAME_VERSION
+    frame["flags"] = flags
+    frame["seq"] = seq & 0xFFFF
+    frame["millis"] = millis & 0xFFFFFFFF
+    for key in ["yaw", "pitch", "roll", "temperature", "pressure", "altitude"]:
+        frame[key] = values.get(key, 0.0)
+    frame["lat"] = round(values.get("lat", 0.0) * 1e7)
+    frame["lng"] = round(values.get("lng", 0.0) * 1e7)
+    frame["month"], frame["day"], frame["year"] = date
+    frame["hour"], frame["minute"], frame["second"], frame["centisecond"] = time
+    rows = frame.view(np.uint8).reshape(1, FRAME_SIZE)
+    frame["crc"] = crc16(rows)
+    return frame.tobytes()
+
+
+def gps_epoch(year, month, day, hour, minute, second, centisecond):
+    # UTC epoch seconds of a GPS date and time, or None if the fields are out of range
+    try:
+        return datetime(year, month, day, hour, minute, second, centisecond * 10000, timezone.utc).timestamp()
+    except ValueError:
+        return None
+
+
+def to_records(frames):
+    # Converts decoded frames to record dicts. Unlike the JSON mode's strings,
+    # the position is numeric ("lat"/"lng", present with a fix) and the GPS
+    # date and time are one UTC epoch ("gps_time", present when valid), so
+    # nothing is formatted here only to be parsed again downstream.
+    records = []
+    for frame in frames.tolist():
+        (_, _, flags, seq, millis, yaw, pitch, roll, temperature, pressure, altitude,
+         lat, lng, year, month, day, hour, minute, second, centisecond, _) = frame
+        record = {
+            "seq": seq,
+            "millis": millis,
+            "yaw": yaw,
+            "pitch": pitch,
+            "roll": roll,
+            "temperature": temperature,
+            "pressure": pressure,
+            "altitude": altitude,
+        }
+        if flags & FLAG_LOCATION_VALID:
+            record["lat"] = lat / 1e7
+            record["lng"] = lng / 1e7
+        else:
+            record["location"] = "INVALID"
+        if flags & FLAG_DATE_VALID and flags & FLAG_TIME_VALID:
+            gps_time = gps_epoch(year, month, day, hour, minute, second, centisecond)
+            if gps_time is not None:
+                record["gps_time"] = gps_time
+        records.append(record)
+    return records
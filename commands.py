@@ -0,0 +1,48 @@
+# Ground commands for CanSat.ino, sent as text lines over the same serial /
+# HC-12 link the telemetry arrives on, e.g. "RATE ATT 10". The can answers
+# each one with a JSON line holding the command under "ack" and its current
+# transmit rates and format, which is how a command is known to have arrived.
+
+RATE_GROUPS = {"attitude_rate": "ATT", "environment_rate": "ENV", "gps_rate": "GPS"}
+MAX_RATE = 50.0  # Hz, the sketch rejects more
+COMMAND_RETRY = 0.25  # seconds between repeats of an unacknowledged command
+COMMAND_TIMEOUT = 5.0  # seconds before giving up on a command
+
+# Where the link bandwidth goes: attitude while the can spins down under the
+# parachute, position once it is on the ground and has to be found
+RATE_PRESETS = {
+    "Descent": {"attitude_rate": 10.0, "environment_rate": 2.0, "gps_rate": 0.5},
+    "Landed": {"attitude_rate": 0.2, "environment_rate": 0.2, "gps_rate": 2.0},
+}
+
+
+def rate_command(setting, rate):
+    if not 0 <= rate <= MAX_RATE:
+        raise ValueError(f"Transmit rate {rate} Hz is outside 0..{MAX_RATE:g} Hz")
+    return f"RATE {RATE_GROUPS[setting]} {rate:g}"
+
+
+def format_command(protocol):
+    return f"FORMAT {protocol.upper()}"
+
+
+def command_key(command):
+    # A newer command for the same group replaces one still waiting for its ack
+    return " ".join(command.split()[:2])
+
+
+def link_commands(settings):
+    # Commands that bring the can in line with the settings; the format goes
+    # first so the acknowledgements of the rates already come in the new format
+    commands = [format_command(settings.get("protocol", "json"))]
+    for setting in RATE_GROUPS:
+        if setting in settings:
+            commands.append(rate_command(setting, float(settings[setting])))
+    return commands
+
+
+def link_text(record):
+    # The settings reported in an acknowledgement, for display
+    rates = ", ".join(f"{RATE_GROUPS[setting]} {float(record[group]):.3g} Hz"
+                      for setting, group in zip(RATE_GROUPS, ["att", "env", "gps"]) if group in record)
+    return f"{rates} ({record.get('format', '?')})"
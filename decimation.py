@@ -0,0 +1,105 @@
+import numpy as np
+
+DEFAULT_FACTOR = 4  # samples merged into one block at each pyramid level
+
+
+class GrowableArray:
+    # Append-only array with amortized O(1) growth
+    def __init__(self, dtype=np.float64, capacity=1024):
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, value):
+        if self.size == len(self.data):
+            self.data = np.concatenate([self.data, np.empty_like(self.data)])
+        self.data[self.size] = value
+        self.size += 1
+
+    def view(self):
+        return self.data[:self.size]
+
+
+class MinMaxPyramid:
+    # Multi-resolution min/max summary of one curve, built as samples arrive.
+    # levels[i] holds one (x, min, max) block per factor ** (i + 1) raw
+    # samples, so a zoomed-out view can draw roughly one block per pixel and
+    # still show every peak. Raw samples are not kept here; full resolution
+    # comes from the caller's in-memory window.
+    def __init__(self, factor=DEFAULT_FACTOR):
+        self.factor = factor
+        self.count = 0
+        self.block_x = 0.0
+        self.pending = np.empty(factor)
+        self.levels = []
+
+    def append(self, x, y):
+        i = self.count % self.factor
+        if i == 0:
+            self.block_x = x
+        self.pending[i] = y
+        self.count += 1
+        if i == self.factor - 1:
+            self.push(0, self.block_x, np.fmin.reduce(self.pending), np.fmax.reduce(self.pending))
+
+    def push(self, level, x, low, high):
+        if level == len(self.levels):
+            self.levels.append((GrowableArray(), GrowableArray(), GrowableArray()))
+        xs, lows, highs = self.levels[level]
+        xs.append(x)
+        lows.append(low)
+        highs.append(high)
+        n = len(xs)
+        if n % self.factor == 0:
+            start = n - self.factor
+            self.push(level + 1, xs.data[start],
+                      np.fmin.reduce(lows.data[start:n]), np.fmax.reduce(highs.data[start:n]))
+
+    def clear(self):
+        self.count = 0
+        self.levels = []
+
+    def query(self, x0, x1, max_points, raw_x, raw_y):
+        # raw_x/raw_y are the newest samples at full resolution, sorted by x.
+        # They cover the range when they start before x0 or still hold every
+        # sample, as for the open range of an auto-ranged view.
+        if len(raw_x) and (raw_x[0] <= x0 or self.count <= len(raw_x)):
+            i0 = max(np.searchsorted(raw_x, x0, "right") - 1, 0)
+            i1 = min(np.searchsorted(raw_x, x1, "left") + 1, len(raw_x))
+            if i1 - i0 <= max_points:
+                return raw_x[i0:i1], raw_y[i0:i1]
+        if not self.levels:
+            return raw_x, raw_y
+
+        # Finest level that fits the visible range into max_points blocks
+        for level, (xs, lows, highs) in enumerate(self.levels):
+            block_x = xs.view()
+            j0 = max(np.searchsorted(block_x, x0, "right") - 1, 0)
+            j1 = min(np.searchsorted(block_x, x1, "left") + 1, len(block_x))
+            if j1 - j0 <= max_points:
+                break
+        pieces = [self.blocks(level, j0, j1)]
+
+        # Newest samples not yet merged into a full block at this level
+        if j1 == len(block_x):
+            position = j1 * self.factor ** (level + 1)
+            for lower in range(level - 1, -1, -1):
+                size = self.factor ** (lower + 1)
+                end = len(self.levels[lower][0])
+                pieces.append(self.blocks(lower, position // size, end))
+                position = end * size
+            offset = max(position - (self.count - len(raw_x)), 0)
+            pieces.append((raw_x[offset:], raw_y[offset:]))
+
+        return (np.concatenate([x for x, _ in pieces]),
+                np.concatenate([y for _, y in pieces]))
+
+    def blocks(self, level, start, end):
+        xs, lows, highs = self.levels[level]
+        x = np.repeat(xs.data[start:end], 2)
+        y = np.empty(len(x))
+        y[0::2] = lows.data[start:end]
+        y[1::2] = highs.data[start:end]
+        return x, y
@@ -0,0 +1,273 @@
+import math
+from collections import deque
+
+# Online estimators for quantities the CanSat does not send: filtered
+# attitude, smoothed altitude, vertical speed, descent rate and apogee.
+# Every estimator keeps a constant amount of state and costs O(1) per sample,
+# so nothing is ever recomputed over the history. Estimators that are linear
+# in their input also follow an affine change of it (a new QNH shifts and
+# scales every altitude) without seeing the samples again, see affine().
+#
+# A pipeline gets a fresh instance of every estimator in ESTIMATORS. Custom
+# ones are added with register_estimator() before the dashboard or the
+# headless receiver is started, e.g.
+#     register_estimator(lambda: ExponentialFilter("temperature", 10.0, "temperature_smoothed"))
+
+
+class Estimator:
+    # Subclasses set `inputs` and `outputs` and implement update(t, *inputs),
+    # returning one value per output, or None when there is nothing new.
+    # Inputs can be record keys or outputs of estimators registered earlier.
+    inputs = ()
+    outputs = ()
+    labels = {}  # output -> label text, e.g. "Vertical Speed (m/s)"
+    plot = False  # outputs are drawn on the attitude graph instead of shown as labels
+
+    def update(self, t, *values):
+        raise NotImplementedError
+
+    def reset(self):
+        pass
+
+    def affine(self, offset, scale):
+        # The input so far is to be read as offset + scale * input: adjust the
+        # state and return (offset, scale) per output, or None if that is not possible
+        return None
+
+    def label(self, output):
+        return self.labels.get(output, output.replace("_", " ").title())
+
+
+class ExponentialFilter(Estimator):
+    # First-order low-pass filter with a time constant in seconds, so irregular
+    # sample intervals are handled. With `wrap` (e.g. 360 for an angle that is
+    # sent wrapped) the filter follows the shortest way around the circle and
+    # its output stays continuous.
+    def __init__(self, source, time_constant, output=None, wrap=None, plot=False, label=None):
+        self.inputs = (source,)
+        self.outputs = (output or f"{source}_filtered",)
+        self.time_constant = time_constant
+        self.wrap = wrap
+        self.plot = plot
+        self.labels = {self.outputs[0]: label} if label else {}
+        self.reset()
+
+    def reset(self):
+        self.value = None
+        self.t = None
+
+    def update(self, t, value):
+        value = float(value)
+        if self.value is None or t < self.t:
+            self.value, self.t = value, t
+            return (value,)
+        alpha = 1.0 - math.exp(-(t - self.t) / self.time_constant)
+        difference = value - self.value
+        if self.wrap:
+            difference = (difference + self.wrap / 2) % self.wrap - self.wrap / 2
+        self.value += alpha * difference
+        self.t = t
+        return (self.value,)
+
+    def affine(self, offset, scale):
+        # The weights of a low-pass filter add up to one
+        if self.wrap:
+            return None
+        if self.value is not None:
+            self.value = offset + scale * self.value
+        return ((offset, scale),)
+
+
+class WindowedDerivative(Estimator):
+    # Rate of change over the last `window` seconds. Each sample enters and
+    # leaves the window once, so the cost is amortized O(1).
+    def __init__(self, source, window, output, scale=1.0, label=None):
+        self.inputs = (source,)
+        self.outputs = (output,)
+        self.window = window
+        self.scale = scale
+        self.labels = {output: label} if label else {}
+        self.reset()
+
+    def reset(self):
+        self.samples = deque()
+
+    def update(self, t, value):
+        value = float(value)
+        if self.samples and t < self.samples[-1][0]:
+            self.samples.clear()
+        self.samples.append((t, value))
+        while t - self.samples[0][0] > self.window:
+            self.samples.popleft()
+        t0, value0 = self.samples[0]
+        if t <= t0:
+            return None
+        return (self.scale * (value - value0) / (t - t0),)
+
+    def affine(self, offset, scale):
+        self.samples = deque((t, offset + scale * value) for t, value in self.samples)
+        return ((0.0, scale),)
+
+
+class AltitudeKalman(Estimator):
+    # Constant-velocity Kalman filter on the barometric altitude: smooths the
+    # altitude and estimates vertical speed. Two states, so plain scalars.
+    inputs = ("altitude",)
+    outputs = ("altitude_filtered", "vertical_speed")
+    labels = {"altitude_filtered": "Altitude, filtered (m)", "vertical_speed": "Vertical Speed (m/s)"}
+
+    def __init__(self, acceleration_noise=2.0, measurement_noise=1.0):
+        self.q = acceleration_noise ** 2
+        self.r = measurement_noise ** 2
+        self.reset()
+
+    def reset(self):
+        self.t = None
+        self.h = self.v = 0.0
+        self.p00, self.p01, self.p11 = self.r, 0.0, 100.0
+
+    def update(self, t, altitude):
+        z = float(altitude)
+        if self.t is None or t < self.t:
+            self.reset()
+            self.t, self.h = t, z
+            return (self.h, self.v)
+        dt = t - self.t
+        self.t = t
+        # Predict
+        self.h += self.v * dt
+        q = self.q
+        p00 = self.p00 + dt * (2 * self.p01 + dt * self.p11) + q * dt ** 4 / 4
+        p01 = self.p01 + dt * self.p11 + q * dt ** 3 / 2
+        p11 = self.p11 + q * dt ** 2
+        # Correct with the measured altitude
+        s = p00 + self.r
+        k0, k1 = p00 / s, p01 / s
+        residual = z - self.h
+        self.h += k0 * residual
+        self.v += k1 * residual
+        self.p00, self.p01, self.p11 = (1 - k0) * p00, (1 - k0) * p01, p11 - k1 * p01
+        return (self.h, self.v)
+
+    def affine(self, offset, scale):
+        # The gains do not depend on the measurements, so the estimates are
+        # linear in them: the altitude weights add up to one, the speed weights to zero
+        self.h = offset + scale * self.h
+        self.v = scale * self.v
+        return ((offset, scale), (0.0, scale))
+
+
+class ApogeeDetector(Estimator):
+    # Reports the highest altitude once the can has dropped `drop` metres
+    # below it, so sensor noise near the top does not trigger it
+    def __init__(self, source="altitude_filtered", drop=10.0):
+        self.inputs = (source,)
+        self.outputs = ("apogee",)
+        self.labels = {"apogee": "Apogee (m)"}
+        self.drop = drop
+        self.reset()
+
+    def reset(self):
+        self.peak = -math.inf
+        self.apogee = None
+
+    def update(self, t, altitude):
+        altitude = float(altitude)
+        if self.apogee is not None:
+            return None
+        self.peak = max(self.peak, altitude)
+        if self.peak - altitude > self.drop:
+            self.apogee = self.peak
+            return (self.apogee,)
+        return None
+
+    def affine(self, offset, scale):
+        if scale <= 0:
+            return None
+        self.peak = offset + scale * self.peak
+        if self.apogee is not None:
+            self.apogee = offset + scale * self.apogee
+        return ((offset, scale),)
+
+
+ESTIMATORS = [
+    # MPU6050_light keeps integrating yaw past 360 degrees, so it is not wrapped
+    lambda: ExponentialFilter("yaw", 0.5, plot=True),
+    lambda: ExponentialFilter("pitch", 0.5, plot=True),
+    lambda: ExponentialFilter("roll", 0.5, plot=True),
+    AltitudeKalman,
+    lambda: WindowedDerivative("altitude", 2.0, "descent_rate", scale=-1.0, label="Descent Rate (m/s)"),
+    ApogeeDetector,
+]
+
+
+def register_estimator(factory):
+    # `factory` is called once per pipeline and must return a new Estimator
+    ESTIMATORS.append(factory)
+
+
+class EstimatorEngine:
+    # Runs the estimators in registration order, so later ones can use the
+    # outputs of earlier ones within the same record
+    def __init__(self, estimators=None):
+        self.estimators = []
+        for estimator in estimators if estimators is not None else [factory() for factory in ESTIMATORS]:
+            self.register(estimator)
+
+    def register(self, estimator):
+        self.estimators.append(estimator)
+
+    def outputs(self, plot=None):
+        return [output for estimator in self.estimators if plot is None or estimator.plot == plot
+                for output in estimator.outputs]
+
+    def label(self, output):
+        for estimator in self.estimators:
+            if output in estimator.outputs:
+                return estimator.label(output)
+        return output
+
+    def update(self, t, record):
+        # Returns {output: value} for every output that changed. An estimator
+        # whose input is missing or not finite (the BMP280 reads NaN until its
+        # first measurement) skips the record, so its state is never poisoned.
+        results = {}
+        for estimator in self.estimators:
+            values = []
+            for key in estimator.inputs:
+                value = results.get(key, record.get(key))
+                if value is None or (isinstance(value, float) and not math.isfinite(value)):
+                    break
+                values.append(value)
+            else:
+                outputs = estimator.update(t, *values)
+                if outputs is not None:
+                    results.update(zip(estimator.outputs, outputs))
+        return results
+
+    def affine(self, key, offset, scale):
+        # `key` so far is to be read as offset + scale * key. Passes that on to
+        # the estimators that depend on it, directly or through other estimators,
+        # and returns {output: (offset, scale)} for every output that changed.
+        # Outputs of estimators that cannot follow start over.
+        changes = {key: (offset, scale)}
+        outputs = {}
+        restarted = set()
+        for estimator in self.estimators:
+            changed = [name for name in estimator.inputs if name in changes or name in restarted]
+            if not changed:
+                continue
+            result = None
+            if len(estimator.inputs) == 1 and changed[0] in changes:
+                result = estimator.affine(*changes[changed[0]])
+            if result is None:
+                estimator.reset()
+                restarted.update(estimator.outputs)
+                continue
+            changes.update(zip(estimator.outputs, result))
+            outputs.update(zip(estimator.outputs, result))
+        return outputs
+
+    def reset(self):
+        for estimator in self.estimators:
+            estimator.reset()
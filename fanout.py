@@ -0,0 +1,207 @@
+import json
+import socket
+import threading
+import time
+from collections import deque
+from metrics import Metrics, metric_name
+from settings import DEFAULT_CAN
+from telemetry_source import TelemetrySource
+
+# Republishes the decoded telemetry of one ground station over TCP, so a
+# logger, a notebook or a second dashboard can follow the live feed while the
+# station holds the COM port. The stream is JSON lines: first
+# {"fanout": 1, "clock": <server time.monotonic()>}, then one
+# [received_at, can, record] per frame. Each subscriber has its own bounded
+# queue that drops its oldest lines when the subscriber falls behind, so a
+# slow client never holds up ingest or the other clients.
+#
+# A station attaches to another one with a receiver port of the form
+# tcp://HOST:PORT, or tcp://HOST:PORT/CAN for a can other than the main one.
+
+FANOUT_SCHEME = "tcp://"
+FANOUT_HOST = "127.0.0.1"  # local consumers only, unless a host is given
+SUBSCRIBER_QUEUE = 10000  # lines buffered per subscriber
+SEND_TIMEOUT = 5.0  # s a subscriber may take no data at all before it is disconnected
+ACCEPT_TIMEOUT = 0.5  # s; lets the server thread notice when it is closed
+
+
+def is_fanout(port):
+    return port.startswith(FANOUT_SCHEME)
+
+
+def parse_address(url):
+    # "tcp://127.0.0.1:5760/Can2" -> ("127.0.0.1", 5760, "Can2"); without a can, the main one
+    address, _, can = url[len(FANOUT_SCHEME):].partition("/")
+    host, _, port = address.rpartition(":")
+    return host or FANOUT_HOST, int(port), can or DEFAULT_CAN
+
+
+class Subscriber(threading.Thread):
+    def __init__(self, connection, address, dropped, on_close, max_lines=SUBSCRIBER_QUEUE):
+        super().__init__(daemon=True)
+        self.connection = connection
+        self.address = address
+        self.dropped = dropped
+        self.on_close = on_close
+        self.lines = deque(maxlen=max_lines)
+        self.ready = threading.Event()
+        self.running = True
+
+    def push(self, lines):
+        # Runs on the ingest thread: never blocks, drops the oldest lines instead
+        overflow = len(self.lines) + len(lines) - self.lines.maxlen
+        if overflow > 0:
+            self.dropped.inc(overflow)
+        self.lines.extend(lines)
+        self.ready.set()
+
+    def close(self):
+        self.running = False
+        self.ready.set()
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)  # out of a blocked sendall()
+        except OSError:
+            pass
+
+    def run(self):
+        try:
+            while self.running:
+                self.ready.wait(ACCEPT_TIMEOUT)
+                self.ready.clear()
+                batch = []
+                while True:
+                    try:
+                        batch.append(self.lines.popleft())
+                    except IndexError:
+                        break
+                if batch:
+                    self.connection.sendall(b"".join(batch))
+        except OSError:
+            pass
+        finally:
+            self.connection.close()
+            self.on_close(self)
+
+
+class FanoutServer:
+    def __init__(self, port, host=FANOUT_HOST, metrics=None):
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.dropped = self.metrics.counter("fanout_dropped")
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.socket = socket.create_server((host, port))
+        self.socket.settimeout(ACCEPT_TIMEOUT)
+        self.port = port
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        print(f"Serving telemetry on {FANOUT_SCHEME}{host}:{port}")
+
+    def run(self):
+        while self.running:
+            try:
+                connection, address = self.socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection.settimeout(SEND_TIMEOUT)
+            subscriber = Subscriber(connection, address, self.dropped, self.remove)
+            subscriber.push([json.dumps({"fanout": 1, "clock": time.monotonic()}).encode() + b"\n"])
+            with self.lock:
+                self.subscribers.append(subscriber)
+                self.metrics.set_gauge("fanout_subscribers", len(self.subscribers))
+            subscriber.start()
+            print(f"Telemetry subscriber connected from {address[0]}:{address[1]}")
+
+    def remove(self, subscriber):
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+            self.metrics.set_gauge("fanout_subscribers", len(self.subscribers))
+
+    def publish(self, can, frames):
+        # Each frame is encoded once, whatever the number of subscribers
+        subscribers = self.subscribers
+        if not subscribers or not frames:
+            return
+        lines = [json.dumps([received_at, can, record], separators=(",", ":")).encode() + b"\n"
+                 for received_at, record in frames]
+        for subscriber in list(subscribers):
+            subscriber.push(lines)
+
+    def close(self):
+        self.running = False
+        self.socket.close()
+        with self.lock:
+            for subscriber in self.subscribers:
+                subscriber.close()
+
+
+class FanoutClient(TelemetrySource):
+    # Telemetry source that follows another station's fan-out server. Like a
+    # serial receiver it reconnects with backoff (see TelemetrySource), and
+    # the receive times are moved onto this machine's clock.
+    error_label = "Fan-out connection error"
+
+    def __init__(self, url, on_frames=None, max_frames=1000, metrics=None, name=None):
+        super().__init__(on_frames, max_frames, metrics, name)
+        self.url = url
+        self.address = url
+        self.host, self.port, self.can = parse_address(url)
+        self.bytes_received = self.metrics.counter(metric_name("bytes_received", name))
+        self.json_errors = self.metrics.counter(metric_name("json_errors", name))
+        self.offset = 0.0  # this machine's monotonic clock minus the server's
+        self.buffer = b""
+        self.connection = None
+
+    def connect(self):
+        self.connection = socket.create_connection((self.host, self.port), timeout=ACCEPT_TIMEOUT)
+
+    def connected(self, reconnected):
+        super().connected(reconnected)
+        self.buffer = b""
+
+    def disconnect(self):
+        self.connection.close()
+
+    def read_loop(self):
+        while self.running.is_set():
+            try:
+                chunk = self.connection.recv(65536)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                return e
+            if not chunk:
+                return ConnectionError("closed by the server")
+            if self.handle_chunk(chunk) and self.on_frames:
+                self.on_frames()
+        return None
+
+    def handle_chunk(self, chunk):
+        self.bytes_received.inc(len(chunk))
+        lines = (self.buffer + chunk).split(b"\n")
+        self.buffer = lines.pop()
+        count = 0
+        for line in lines:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                self.json_errors.inc()
+                continue
+            if isinstance(message, dict):
+                self.offset = time.monotonic() - message.get("clock", time.monotonic())
+                continue
+            try:
+                received_at, can, record = message
+            except (TypeError, ValueError):
+                self.json_errors.inc()
+                continue
+            if can != self.can:
+                continue
+            self.push(received_at + self.offset, record)
+            count += 1
+        self.frames_decoded.inc(count)
+        return count
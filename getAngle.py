@@ -4,74 +4,143 @@ Created on Sat Mar 14 13:24:50 2020
 
 Dynamic plot of the MPU6050 angles. How to use:
     - Upload the 'getAngle.ino' code to the Arduino
-    - Modify the port name below according to your own port
-    - Run this script
+    - Run this script with your own port, e.g. python getAngle.py --port COM4
+      (see --help for the plotted window, the redraw rate and the baud rate)
 
 Requires the Python libraries: serial, matplotlib, numpy
 
 @author: rfetick
 """
 
-from serial import Serial
-import matplotlib.pyplot as plt
-import numpy as np
+import argparse
 import re
+import time
+import numpy as np
+from serial import Serial, SerialException
+from telemetry_store import RingBuffer
 
 #%% DEFINITIONS
-port = "COM4"   # modify this port name !!!
-baudrate = 9600 # must be similar to the one in 'getAngle.ino'
-N = 200         # number of plotted measurements
-M = 2000        # number of total measurements before stop
+PORT = "COM4"     # default port name, override with --port
+BAUDRATE = 9600   # must be similar to the one in 'getAngle.ino'
+WINDOW = 200      # number of plotted measurements
+RATE = 30         # redraws per second, independent of the measurement rate
+NUMBER = re.compile(rb"-?\d+(?:\.\d+)?")
+
+#%% PARSING
+def parse_lines(data):
+    # Parses every complete line of a bulk read at once. Returns the angles as
+    # an (n, 3) array, the lines that are not three numbers (start-up messages
+    # or garbled lines) and the trailing partial line for the next read.
+    lines = data.split(b"\n")
+    rest = lines.pop()
+    rows, others = [], []
+    for line in lines:
+        numbers = NUMBER.findall(line)
+        if len(numbers) == 3:
+            rows.append(numbers)
+        elif line.strip():
+            others.append(line)
+    angles = np.array(rows, dtype=float).reshape(-1, 3)
+    return angles, others, rest
+
+#%% READ SERIAL
+class AngleStream():
+    # Reads whatever the port has buffered in one call and keeps the last
+    # `window` angles in ring buffers, so nothing is shifted per sample
+    def __init__(self, serial_port, window=WINDOW):
+        self.serial_port = serial_port
+        self.rings = [RingBuffer(window) for _ in range(3)]
+        self.buffer = b""
+        self.count = 0
+
+    def poll(self):
+        data = self.serial_port.read(self.serial_port.in_waiting or 1)
+        if not data:
+            return 0
+        angles, others, self.buffer = parse_lines(self.buffer + data)
+        for line in others:
+            print(line.decode("utf-8", errors="replace").strip())
+        for k, ring in enumerate(self.rings):
+            ring.extend(angles[:, k])
+        self.count += len(angles)
+        return len(angles)
 
 #%% DYNAMIC PLOT
-# https://stackoverflow.com/questions/10944621/dynamically-updating-plot-in-matplotlib
-class DynamicUpdate():
-    def on_launch(self):
+class AnglePlotter():
+    # The axes never change, so the background is drawn once and cached; each
+    # update only restores it and redraws the three lines (blitting)
+    def __init__(self, window=WINDOW):
+        # Only the plot needs matplotlib; parsing and reading work without it
+        import matplotlib.pyplot as plt
+        self.plt = plt
         self.figure, self.ax = plt.subplots()
         self.ax.axes.set_xlabel('Iteration')
         self.ax.axes.set_ylabel('Angle [deg]')
-        self.ax.plot([],[],'o')
-        self.ax.plot([],[],'o')
-        self.ax.plot([],[],'o')
-        self.ax.set_ylim(-180,180)
-        self.ax.set_xlim(0, N)
+        self.lines = [self.ax.plot([], [], 'o', animated=True)[0] for _ in range(3)]
+        self.ax.set_ylim(-180, 180)
+        self.ax.set_xlim(0, window)
         self.ax.grid()
-        T = np.arange(N,dtype=float)
-        for k in range(3):
-            self.ax.lines[k].set_xdata(T)
-            self.ax.lines[k].set_ydata(0*T)
+        self.x = np.arange(window, dtype=float)
+        self.background = None
+        # A resize redraws the figure, which invalidates the cached background
+        self.figure.canvas.mpl_connect("draw_event", self.on_draw)
+        plt.show(block=False)
+        plt.pause(0.1)
 
-    def on_running(self, y, y2, y3):
-        self.ax.lines[0].set_ydata(y)
-        self.ax.lines[1].set_ydata(y2)
-        self.ax.lines[2].set_ydata(y3)
-        self.figure.canvas.draw()
-        self.figure.canvas.flush_events()
+    def on_draw(self, event):
+        self.background = self.figure.canvas.copy_from_bbox(self.figure.bbox)
 
-du = DynamicUpdate()
-du.on_launch()
+    def is_open(self):
+        return self.plt.fignum_exists(self.figure.number)
 
-#%% READ SERIAL
-DATA = np.zeros((N,3))
+    def update(self, rings):
+        canvas = self.figure.canvas
+        if self.background is None:
+            canvas.draw()
+        canvas.restore_region(self.background)
+        for line, ring in zip(self.lines, rings):
+            y = ring.view()
+            line.set_data(self.x[:len(y)], y)
+            self.ax.draw_artist(line)
+        canvas.blit(self.figure.bbox)
+        canvas.flush_events()
+
+#%% MAIN
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Live plot of the MPU6050 angles sent by getAngle.ino")
+    parser.add_argument("--port", default=PORT, help="serial port of the Arduino, e.g. COM4 or /dev/ttyUSB0")
+    parser.add_argument("--baud", type=int, default=BAUDRATE)
+    parser.add_argument("--window", type=int, default=WINDOW, help="number of plotted measurements")
+    parser.add_argument("--rate", type=float, default=RATE, help="redraws per second")
+    parser.add_argument("--count", type=int, help="stop after this many measurements (default: when the plot is closed)")
+    args = parser.parse_args(argv)
+
+    try:
+        # The read timeout keeps the plot responsive when no data arrives
+        serial_port = Serial(port=args.port, baudrate=args.baud, timeout=1 / args.rate, writeTimeout=1)
+    except SerialException as e:
+        print('Warning: could not open serial port ' + args.port + ': ' + str(e))
+        return 1
 
-with Serial(port=port, baudrate=baudrate, timeout=1, writeTimeout=1) as port_serie:
-    if port_serie.isOpen():
-        port_serie.flush()
+    with serial_port:
+        serial_port.reset_input_buffer()
         print('Serial port open: wait for first data')
-        for i in range(8): # do not process first lines
-            ligne = port_serie.readline()
-            print(str(ligne)[2:-1])
-        for i in range(M):
-            ligne = port_serie.readline()
-            j = i * (i<N) + (N-1) * (i>=N)
-            if i>=N: DATA = np.roll(DATA,-1,axis=0)
-            try:
-                temp = re.findall('[-.0-9]+',str(ligne)[2:-5])
-                DATA[j,:] = [float(t) for t in temp]
-                if (i%5)==0:
-                    du.on_running(DATA[:,0],DATA[:,1],DATA[:,2])
-            except:
-                print("Exception: %s"%ligne)
-        port_serie.close()
-    else:
-        print('Warning: could not open serial port '+port)
\ No newline at end of file
+        stream = AngleStream(serial_port, args.window)
+        plotter = AnglePlotter(args.window)
+        started = next_draw = time.monotonic()
+        try:
+            while plotter.is_open() and (args.count is None or stream.count < args.count):
+                stream.poll()
+                now = time.monotonic()
+                if now >= next_draw:
+                    plotter.update(stream.rings)
+                    next_draw = now + 1 / args.rate
+        except KeyboardInterrupt:
+            pass
+        elapsed = time.monotonic() - started
+        print(f"{stream.count} measurements in {elapsed:.1f} s ({stream.count / max(elapsed, 1e-9):.0f} Hz)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,70 @@
+import math
+import numpy as np
+from decimation import GrowableArray
+
+# GPS ground track in metres east and north of the first fix, so it can be
+# drawn offline on a plain distance grid. Equirectangular projection, which
+# is accurate to well under a metre over a CanSat's few kilometres of drift.
+
+EARTH_RADIUS = 6371000.0  # metres
+BASE_TOLERANCE = 0.5  # metres between kept points at the finest level
+LEVELS = 16  # each level doubles the tolerance, up to ~16 km
+PIXEL_TOLERANCE = 2.0  # drawn points are at least this many pixels apart
+
+
+class GroundTrack:
+    # Next to the full track, level i keeps only fixes at least
+    # BASE_TOLERANCE * 2 ** i metres from the previous point kept on that
+    # level. The levels grow as fixes arrive (O(LEVELS) per fix), so a redraw
+    # picks the level matching the zoom instead of thinning the whole track.
+    def __init__(self):
+        self.clear()
+
+    def __len__(self):
+        return len(self.east)
+
+    def clear(self):
+        self.origin = None
+        self.cos_lat = 1.0
+        self.east = GrowableArray()
+        self.north = GrowableArray()
+        self.levels = [(GrowableArray(), GrowableArray()) for _ in range(LEVELS)]
+
+    def append(self, lat, lng):
+        if self.origin is None:
+            self.origin = (lat, lng)
+            self.cos_lat = math.cos(math.radians(lat))
+        x = math.radians(lng - self.origin[1]) * EARTH_RADIUS * self.cos_lat
+        y = math.radians(lat - self.origin[0]) * EARTH_RADIUS
+        self.east.append(x)
+        self.north.append(y)
+        tolerance = BASE_TOLERANCE
+        for xs, ys in self.levels:
+            n = len(xs)
+            if n == 0 or (x - xs.data[n - 1]) ** 2 + (y - ys.data[n - 1]) ** 2 >= tolerance ** 2:
+                xs.append(x)
+                ys.append(y)
+            tolerance *= 2
+
+    def latest(self):
+        if not len(self):
+            return None
+        return self.east.data[len(self) - 1], self.north.data[len(self) - 1]
+
+    def distance(self):
+        # Straight-line distance of the latest fix from the first one
+        latest = self.latest()
+        return math.hypot(*latest) if latest is not None else 0.0
+
+    def query(self, metres_per_pixel):
+        # Polyline for the current zoom; always ends at the latest fix
+        tolerance = metres_per_pixel * PIXEL_TOLERANCE
+        level = int(math.floor(math.log2(tolerance / BASE_TOLERANCE))) if tolerance > BASE_TOLERANCE else -1
+        if level < 0 or not len(self):
+            return self.east.view(), self.north.view()
+        xs, ys = self.levels[min(level, LEVELS - 1)]
+        x, y = xs.view(), ys.view()
+        latest = self.latest()
+        if (x[-1], y[-1]) != latest:
+            x, y = np.append(x, latest[0]), np.append(y, latest[1])
+        return x, y
@@ -0,0 +1,94 @@
+import argparse
+import threading
+import time
+from receivers import ReceiverGroup
+from settings import DEFAULT_HISTORY, PROTOCOLS, REPLAY_SPEEDS
+from metrics import Metrics
+from commands import RATE_GROUPS
+
+# Ground-station receiver without Qt or pyqtgraph: runs the same pipeline as
+# the dashboard, records the mission and prints a summary every few seconds.
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Receive CanSat telemetry without the GUI")
+    parser.add_argument("--port", help="serial port of the HC-12 receiver, e.g. COM3 or /dev/ttyUSB0, "
+                                       "or tcp://127.0.0.1:5760 to follow another station")
+    parser.add_argument("--receivers", default="",
+                        help="more receivers read in parallel: PORT for the same can or PORT@CAN, comma separated")
+    parser.add_argument("--baud", type=int, default=9600)
+    parser.add_argument("--protocol", choices=PROTOCOLS, default="json")
+    parser.add_argument("--replay", help="replay a recorded mission folder instead of a serial port")
+    parser.add_argument("--speed", choices=list(REPLAY_SPEEDS), default="max", help="replay speed")
+    parser.add_argument("--start", type=float, default=0.0, help="replay start, seconds into the mission")
+    parser.add_argument("--record-dir", default="missions", help="where to record live missions ('' to disable)")
+    parser.add_argument("--history", type=int, default=DEFAULT_HISTORY, help="samples kept in memory")
+    parser.add_argument("--qnh", type=float, default=1013.25, help="sea-level pressure in hPa for the altitude")
+    parser.add_argument("--rates", help="command the can's transmit rates in Hz: ATTITUDE,ENVIRONMENT,GPS, e.g. 10,2,0.5")
+    parser.add_argument("--serve", type=int, default=0, metavar="PORT",
+                        help="republish the telemetry on this local TCP port for other consumers")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between summaries")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    args = parser.parse_args(argv)
+    if not args.port and not args.replay:
+        parser.error("either --port or --replay is required")
+
+    settings = {
+        "com_port": args.port,
+        "receivers": args.receivers,
+        "baud_rate": args.baud,
+        "protocol": args.protocol,
+        "replay_path": args.replay or "",
+        "replay_speed": args.speed,
+        "replay_start": args.start,
+        "record_dir": args.record_dir,
+        "history_size": args.history,
+        "serve_port": args.serve,
+        "qnh": args.qnh,
+    }
+    if args.rates:
+        try:
+            settings.update(zip(RATE_GROUPS, (float(rate) for rate in args.rates.split(",", 2))))
+        except ValueError:
+            parser.error("--rates takes up to three numbers, e.g. 10,2,0.5")
+    metrics = Metrics()
+    receivers = ReceiverGroup(metrics)
+    frames_ready = threading.Event()
+    receivers.configure(settings, frames_ready.set)
+    if not receivers.sources:
+        return 1
+    views = receivers.views()
+
+    started = last_summary = time.monotonic()
+    last_records = {label: 0 for label, _ in views}
+    try:
+        # A replay ends by itself; serial sources run until interrupted
+        while receivers.is_alive() or receivers.pending():
+            if frames_ready.wait(0.2):
+                frames_ready.clear()
+                receivers.drain()
+            now = time.monotonic()
+            if now - last_summary >= args.interval:
+                for label, pipeline in views:
+                    rate = (pipeline.records.value - last_records[label]) / (now - last_summary)
+                    print(f"[{now - started:8.1f} s] {view_prefix(label, views)}{rate:6.1f}/s {pipeline.summary()}",
+                          flush=True)
+                    last_records[label] = pipeline.records.value
+                last_summary = now
+            if args.duration is not None and now - started >= args.duration:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receivers.close()
+        for label, pipeline in views:
+            print(f"[{time.monotonic() - started:8.1f} s] {view_prefix(label, views)}final: {pipeline.summary()}")
+    return 0
+
+
+def view_prefix(label, views):
+    return f"{label}: " if len(views) > 1 else ""
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
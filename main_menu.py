@@ -1,10 +1,15 @@
 import sys
+import time
+STARTUP_STARTED = time.perf_counter()  # taken before the Qt imports so they are counted too
+STARTUP_BUDGET_MS = 1500  # time-to-interactive budget for the main menu
+
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget, QGraphicsOpacityEffect, 
-                             QLabel, QStackedWidget, QDialog, QComboBox, QFormLayout, QDialogButtonBox, QLineEdit, QHBoxLayout)
+                             QLabel, QStackedWidget, QDialog, QComboBox, QFormLayout, QDialogButtonBox, QLineEdit, QHBoxLayout,
+                             QFileDialog)
 from PyQt5.QtCore import Qt, QPropertyAnimation, QRect, QTimer, QEasingCurve
 from PyQt5.QtGui import QFont, QColor, QPalette, QBrush
-from arduino_gui import ArduinoGUI
-import serial.tools.list_ports
+from settings import DEFAULT_SETTINGS, DEFAULT_HISTORY, DEFAULT_DISPLAY_RATE, PROTOCOLS, REPLAY_SPEEDS
+from port_scanner import PortScanner
 from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton
 from PyQt5.QtGui import QColor
 from PyQt5.QtCore import Qt, QPropertyAnimation, QRect, QEasingCurve
@@ -64,26 +69,91 @@ class AnimatedButton(QPushButton):
         self.opacity_animation.start()
 
 class OptionsDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, port_scanner, parent=None):
         super().__init__(parent)
+        self.port_scanner = port_scanner
         self.setWindowTitle("Options")
         self.setStyleSheet("color: yellow; background-color: black;")
 
         layout = QFormLayout(self)
 
         # COM Port selection
+        # Editable, so another station's feed can be entered as tcp://HOST:PORT
         self.com_port_combo = QComboBox()
+        self.com_port_combo.setEditable(True)
         self.update_com_ports()
         layout.addRow("COM Port:", self.com_port_combo)
 
+        # More HC-12 receivers, for antenna diversity or other cans: PORT or PORT@CAN, comma separated
+        self.receivers_edit = QLineEdit()
+        self.receivers_edit.setPlaceholderText("e.g. COM4, COM5@Can2")
+        layout.addRow("Extra Receivers:", self.receivers_edit)
+
         # Baud Rate
         self.baud_rate_edit = QLineEdit("9600")
         layout.addRow("Baud Rate:", self.baud_rate_edit)
 
+        # Telemetry format sent by the CanSat; JSON is the fallback
+        self.protocol_combo = QComboBox()
+        self.protocol_combo.addItems(PROTOCOLS)
+        layout.addRow("Telemetry Format:", self.protocol_combo)
+
+        # Number of samples kept in memory for the graph
+        self.history_size_edit = QLineEdit(str(DEFAULT_HISTORY))
+        layout.addRow("History Size:", self.history_size_edit)
+
+        # How often the dashboard repaints, in frames per second
+        self.display_rate_edit = QLineEdit(str(DEFAULT_DISPLAY_RATE))
+        layout.addRow("Display Rate (Hz):", self.display_rate_edit)
+
+        # Missions received over serial are recorded here; leave empty to disable
+        self.record_dir_edit = QLineEdit("missions")
+        layout.addRow("Record Folder:", self.record_dir_edit)
+
+        # Republish the telemetry on this local TCP port for loggers, notebooks
+        # or another dashboard (COM Port tcp://127.0.0.1:PORT); 0 turns it off
+        self.serve_port_edit = QLineEdit("0")
+        layout.addRow("Serve Port:", self.serve_port_edit)
+
+        # Replay a recorded mission instead of reading the COM port
+        replay_row = QHBoxLayout()
+        self.replay_path_edit = QLineEdit()
+        self.replay_path_edit.setPlaceholderText("None (live serial data)")
+        replay_row.addWidget(self.replay_path_edit)
+        self.replay_browse_button = QPushButton("Browse")
+        self.replay_browse_button.setStyleSheet(self.get_button_stylesheet())
+        self.replay_browse_button.clicked.connect(self.browse_replay)
+        replay_row.addWidget(self.replay_browse_button)
+        layout.addRow("Replay Mission:", replay_row)
+
+        self.replay_speed_combo = QComboBox()
+        self.replay_speed_combo.addItems(REPLAY_SPEEDS.keys())
+        layout.addRow("Replay Speed:", self.replay_speed_combo)
+
+        self.replay_start_edit = QLineEdit("0")
+        layout.addRow("Replay Start (s):", self.replay_start_edit)
+
+        # Reference pressure for the altitude; changing it recalculates the history.
+        # Calibrate QNH on the dashboard sets it from pad readings at this elevation.
+        self.qnh_edit = QLineEdit("1013.25")
+        layout.addRow("QNH (hPa):", self.qnh_edit)
+        self.field_elevation_edit = QLineEdit("0")
+        layout.addRow("Field Elevation (m):", self.field_elevation_edit)
+
+        # How often the CanSat sends each sensor group; 0 turns a group off.
+        # Sent to the can as commands when the dashboard connects or these change.
+        self.attitude_rate_edit = QLineEdit("1")
+        layout.addRow("Attitude Rate (Hz):", self.attitude_rate_edit)
+        self.environment_rate_edit = QLineEdit("1")
+        layout.addRow("Environment Rate (Hz):", self.environment_rate_edit)
+        self.gps_rate_edit = QLineEdit("1")
+        layout.addRow("GPS Rate (Hz):", self.gps_rate_edit)
+
         # Refresh COM ports button
         self.refresh_button = QPushButton("Refresh COM Ports")
         self.refresh_button.setStyleSheet(self.get_button_stylesheet())
-        self.refresh_button.clicked.connect(self.update_com_ports)
+        self.refresh_button.clicked.connect(self.port_scanner.refresh)
+        self.port_scanner.ports_changed.connect(self.update_com_ports)
         layout.addRow(self.refresh_button)
 
         # Buttons
@@ -97,17 +167,41 @@ class OptionsDialog(QDialog):
         button_box.rejected.connect(self.reject)
         layout.addRow(button_box)
 
-    def update_com_ports(self):
+    def done(self, result):
+        # The scanner outlives the dialog
+        self.port_scanner.ports_changed.disconnect(self.update_com_ports)
+        super().done(result)
+
+    def update_com_ports(self, ports=None):
+        # Uses the scanner's cached list; keeps the current choice if that port is still there
+        current = self.com_port_combo.currentText()
         self.com_port_combo.clear()
-        ports = [port.device for port in serial.tools.list_ports.comports()]
-        self.com_port_combo.addItems(ports)
-        if ports:
-            self.com_port_combo.setCurrentIndex(0)
+        self.com_port_combo.addItems(self.port_scanner.ports if ports is None else ports)
+        self.com_port_combo.setCurrentText(current)
+
+    def browse_replay(self):
+        path = QFileDialog.getExistingDirectory(self, "Select Mission Recording", self.record_dir_edit.text())
+        if path:
+            self.replay_path_edit.setText(path)
 
     def get_settings(self):
         return {
             "com_port": self.com_port_combo.currentText(),
-            "baud_rate": int(self.baud_rate_edit.text())
+            "receivers": self.receivers_edit.text(),
+            "baud_rate": int(self.baud_rate_edit.text()),
+            "protocol": self.protocol_combo.currentText(),
+            "history_size": int(self.history_size_edit.text()),
+            "display_rate": int(self.display_rate_edit.text()),
+            "record_dir": self.record_dir_edit.text(),
+            "serve_port": int(self.serve_port_edit.text() or 0),
+            "replay_path": self.replay_path_edit.text(),
+            "replay_speed": self.replay_speed_combo.currentText(),
+            "replay_start": float(self.replay_start_edit.text()),
+            "qnh": float(self.qnh_edit.text()),
+            "field_elevation": float(self.field_elevation_edit.text()),
+            "attitude_rate": float(self.attitude_rate_edit.text()),
+            "environment_rate": float(self.environment_rate_edit.text()),
+            "gps_rate": float(self.gps_rate_edit.text())
         }
 
     def get_button_stylesheet(self):
@@ -198,12 +292,16 @@ class MainWindow(QMainWindow):
         # Make the window full-screen
         self.showFullScreen()    
 
+        # Serial ports are enumerated in the background and cached
+        self.port_scanner = PortScanner(parent=self)
+        self.port_scanner.ports_changed.connect(self.on_ports_changed)
+        self.com_port_chosen = False
+
         # Default settings
         self.arduino_settings = self.get_default_settings()
 
-        # Initialize Arduino GUI with settings
-        self.arduino_gui = ArduinoGUI(self, self.arduino_settings)
-        self.stacked_widget.addWidget(self.arduino_gui)
+        # The telemetry screen (and pyqtgraph) is only built when Start is first pressed
+        self.arduino_gui = None
 
         # Start the buttons from the bottom of the screen
         self.start_button.setGeometry(QRect(self.width() // 2 - 150, self.height(), 300, 100))
@@ -226,11 +324,32 @@ class MainWindow(QMainWindow):
         QTimer.singleShot(1000, self.show_arduino_gui)
 
     def get_default_settings(self):
-        ports = [port.device for port in serial.tools.list_ports.comports()]
-        return {
-            "com_port": ports[0] if ports else "COM1",
-            "baud_rate": 9600
-        }
+        ports = self.port_scanner.ports
+        return {**DEFAULT_SETTINGS, "com_port": ports[0] if ports else DEFAULT_SETTINGS["com_port"]}
+
+    def on_ports_changed(self, ports):
+        # Until the user picks a port, follow the first one that is plugged in.
+        # Only before the dashboard is built: once it runs, an unplugged receiver
+        # is waited for (see SerialConnection), not swapped for another port.
+        # A new dict, as the dashboard keeps the one it was given.
+        if self.com_port_chosen or self.arduino_gui is not None:
+            return
+        if ports and self.arduino_settings["com_port"] not in ports:
+            self.arduino_settings = {**self.arduino_settings, "com_port": ports[0]}
+
+    def report_startup_time(self):
+        elapsed = (time.perf_counter() - STARTUP_STARTED) * 1000
+        print(f"Time to interactive: {elapsed:.0f} ms")
+        if elapsed > STARTUP_BUDGET_MS:
+            print(f"Warning: startup is over the {STARTUP_BUDGET_MS} ms budget")
+
+    def build_arduino_gui(self):
+        started = time.perf_counter()
+        # Deferred so pyqtgraph and the telemetry pipeline do not slow down the menu
+        from arduino_gui import ArduinoGUI
+        self.arduino_gui = ArduinoGUI(self, self.arduino_settings)
+        self.stacked_widget.addWidget(self.arduino_gui)
+        print(f"Telemetry screen built in {(time.perf_counter() - started) * 1000:.0f} ms")
 
     def exit_application(self):
         self.exit_button.animate_out(QRect(self.width() // 2 - 150, self.height() + 100, 300, 100))
@@ -239,16 +358,36 @@ class MainWindow(QMainWindow):
         QTimer.singleShot(1000, QApplication.quit)
 
     def show_arduino_gui(self):
+        if self.arduino_gui is None:
+            self.build_arduino_gui()
         self.stacked_widget.setCurrentWidget(self.arduino_gui)
         self.arduino_gui.fade_in()
 
     def show_options(self):
-        options_dialog = OptionsDialog(self)
+        options_dialog = OptionsDialog(self.port_scanner, self)
         options_dialog.com_port_combo.setCurrentText(self.arduino_settings["com_port"])
+        options_dialog.receivers_edit.setText(self.arduino_settings["receivers"])
         options_dialog.baud_rate_edit.setText(str(self.arduino_settings["baud_rate"]))
+        options_dialog.protocol_combo.setCurrentText(self.arduino_settings["protocol"])
+        options_dialog.history_size_edit.setText(str(self.arduino_settings["history_size"]))
+        options_dialog.display_rate_edit.setText(str(self.arduino_settings["display_rate"]))
+        options_dialog.record_dir_edit.setText(self.arduino_settings["record_dir"])
+        options_dialog.serve_port_edit.setText(str(self.arduino_settings["serve_port"]))
+        options_dialog.replay_path_edit.setText(self.arduino_settings["replay_path"])
+        options_dialog.replay_speed_combo.setCurrentText(self.arduino_settings["replay_speed"])
+        options_dialog.replay_start_edit.setText(str(self.arduino_settings["replay_start"]))
+        options_dialog.qnh_edit.setText(f"{self.arduino_settings['qnh']:.2f}")
+        options_dialog.field_elevation_edit.setText(f"{self.arduino_settings['field_elevation']:g}")
+        options_dialog.attitude_rate_edit.setText(f"{self.arduino_settings['attitude_rate']:g}")
+        options_dialog.environment_rate_edit.setText(f"{self.arduino_settings['environment_rate']:g}")
+        options_dialog.gps_rate_edit.setText(f"{self.arduino_settings['gps_rate']:g}")
         if options_dialog.exec_() == QDialog.Accepted:
-            self.arduino_settings = options_dialog.get_settings()
-            self.arduino_gui.update_settings(self.arduino_settings)
+            # Settings the dialog does not edit are kept
+            self.arduino_settings = {**self.arduino_settings, **options_dialog.get_settings()}
+            self.com_port_chosen = True
+            if self.arduino_gui is not None:
+                self.arduino_gui.update_settings(self.arduino_settings)
+        options_dialog.deleteLater()
 
     def show_main_menu(self):
         self.stacked_widget.setCurrentWidget(self.menu_widget)
@@ -260,4 +399,6 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
+    # Runs once the event loop is up and the menu can take input
+    QTimer.singleShot(0, window.report_startup_time)
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,118 @@
+import json
+import time
+
+# Lightweight pipeline metrics. Each counter or histogram is written by one
+# thread only (reader or GUI), so plain attribute updates are enough.
+
+HISTOGRAM_BUCKETS = 28  # power-of-two microsecond buckets, up to ~134 s
+
+
+def metric_name(name, scope=None):
+    # With several receivers each one's metrics are kept apart as "<scope>.<name>"
+    return f"{scope}.{name}" if scope else name
+
+
+class Counter:
+    __slots__ = ["value"]
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Histogram:
+    # Bucket i counts durations below 2 ** i microseconds, so recording is O(1)
+    __slots__ = ["buckets", "count", "total", "max"]
+
+    def __init__(self):
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        bucket = min(int(seconds * 1e6).bit_length(), HISTOGRAM_BUCKETS - 1)
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        # Upper bound of the bucket holding the p-th percentile, in seconds
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return min((1 << i) / 1e6, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "buckets_us": {1 << i: n for i, n in enumerate(self.buckets) if n},
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.started = time.monotonic()
+
+    def counter(self, name):
+        return self.counters.setdefault(name, Counter())
+
+    def histogram(self, name):
+        return self.histograms.setdefault(name, Histogram())
+
+    def total(self, name):
+        # Sum of a counter over all scopes
+        return sum(counter.value for key, counter in self.counters.items() if key.rpartition(".")[2] == name)
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def snapshot(self):
+        return {
+            "uptime": time.monotonic() - self.started,
+            "counters": {name: counter.value for name, counter in self.counters.items()},
+            "gauges": dict(self.gauges),
+            "histograms": {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+        }
+
+    def export(self, path):
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def format(self, previous=None):
+        # Human-readable summary; with a previous snapshot, counters also show rates
+        snapshot = self.snapshot()
+        interval = snapshot["uptime"] - previous["uptime"] if previous else 0.0
+        lines = []
+        # Scoped names from several receivers need a wider first column
+        names = [*snapshot["counters"], *snapshot["gauges"], *snapshot["histograms"]]
+        width = max([18] + [len(name) + 2 for name in names])
+        for name, value in sorted(snapshot["counters"].items()):
+            line = f"{name:<{width}}{value:>10}"
+            if interval > 0:
+                rate = (value - previous["counters"].get(name, 0)) / interval
+                line += f"  {rate:>9.1f}/s"
+            lines.append(line)
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.append(f"{name:<{width}}{value:>10}")
+        for name, histogram in sorted(snapshot["histograms"].items()):
+            lines.append(f"{name:<{width}}p50 {histogram['p50'] * 1e3:7.2f} ms  "
+                         f"p99 {histogram['p99'] * 1e3:7.2f} ms  max {histogram['max'] * 1e3:7.2f} ms")
+        return "\n".join(lines)
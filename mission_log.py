@@ -0,0 +1,198 @@
+import json
+import os
+import time
+from datetime import datetime, timezone
+import numpy as np
+from telemetry_source import TelemetrySource
+
+# Column-oriented mission log: one raw little-endian float64 file per column
+# in a mission directory, appended one chunk at a time. Missing values are NaN.
+COLUMNS = ["received_at", "seq", "yaw", "pitch", "roll", "temperature", "pressure", "altitude",
+           "lat", "lng", "gps_time"]
+VALUE_COLUMNS = ["yaw", "pitch", "roll", "temperature", "pressure", "altitude"]
+COLUMN_DTYPE = np.dtype("<f8")
+INDEX_FILE = "columns.json"
+
+DEFAULT_CHUNK_SIZE = 1024
+
+
+def parse_location(location):
+    try:
+        lat, lng = location.split(",")
+        return float(lat), float(lng)
+    except (AttributeError, ValueError):
+        return np.nan, np.nan
+
+
+def parse_gps_time(date, time_of_day):
+    # GPS date/time strings as sent by CanSat.ino, as UTC epoch seconds
+    if not isinstance(date, str) or not isinstance(time_of_day, str):
+        return np.nan
+    fmt = "%m/%d/%Y %H:%M:%S.%f" if "." in time_of_day else "%m/%d/%Y %H:%M:%S"
+    try:
+        gps_time = datetime.strptime(f"{date} {time_of_day}", fmt)
+    except ValueError:
+        return np.nan
+    return gps_time.replace(tzinfo=timezone.utc).timestamp()
+
+
+def record_to_row(received_at, record):
+    row = [received_at, record.get("seq", np.nan)]
+    for key in VALUE_COLUMNS:
+        try:
+            row.append(float(record[key]))
+        except (KeyError, TypeError, ValueError):
+            row.append(np.nan)
+    # Binary frames and replayed rows carry the position and GPS time as numbers
+    if "lat" in record:
+        row.extend((record["lat"], record["lng"]))
+    else:
+        row.extend(parse_location(record.get("location")))
+    if "gps_time" in record:
+        row.append(record["gps_time"])
+    else:
+        row.append(parse_gps_time(record.get("date"), record.get("time")))
+    return row
+
+
+def row_to_record(row):
+    # Inverse of record_to_row: only the fields that were present come back
+    values = dict(zip(COLUMNS, row))
+    record = {key: float(values[key]) for key in VALUE_COLUMNS if not np.isnan(values[key])}
+    if not np.isnan(values["seq"]):
+        record["seq"] = int(values["seq"])
+    if not np.isnan(values["lat"]):
+        record["lat"] = float(values["lat"])
+        record["lng"] = float(values["lng"])
+    if not np.isnan(values["gps_time"]):
+        record["gps_time"] = float(values["gps_time"])
+    return record
+
+
+def new_mission_path(record_dir):
+    return os.path.join(record_dir, datetime.now().strftime("mission-%Y%m%d-%H%M%S"))
+
+
+class MissionRecorder:
+    # Buffers rows in a preallocated chunk and appends it column by column,
+    # so recording costs one row assignment per frame.
+    def __init__(self, path, chunk_size=DEFAULT_CHUNK_SIZE, flush_interval=1.0):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, INDEX_FILE), "w") as f:
+            json.dump({"columns": COLUMNS, "dtype": COLUMN_DTYPE.str}, f)
+        self.files = [open(os.path.join(path, f"{name}.f8"), "ab") for name in COLUMNS]
+        self.chunk = np.empty((len(COLUMNS), chunk_size), dtype=COLUMN_DTYPE)
+        self.rows = 0
+        self.recorded = 0
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+
+    def append(self, received_at, record):
+        self.chunk[:, self.rows] = record_to_row(received_at, record)
+        self.rows += 1
+        self.recorded += 1
+        # Flush on a full chunk, or at least every flush_interval so a crash loses little
+        if self.rows == self.chunk.shape[1] or received_at - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            for column, f in zip(self.chunk, self.files):
+                column[:self.rows].tofile(f)
+                f.flush()
+            self.rows = 0
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        if self.files:
+            self.flush()
+            for f in self.files:
+                f.close()
+            self.files = []
+
+
+class MissionLog:
+    # Read-only, memory-mapped view of a recorded mission. Nothing is loaded
+    # into RAM until a column is actually indexed.
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE)) as f:
+            self.columns = json.load(f)["columns"]
+        self.data = {name: self.open_column(name) for name in self.columns}
+        # Rows are complete only up to the shortest column
+        self.length = min(len(column) for column in self.data.values())
+
+    def open_column(self, name):
+        filename = os.path.join(self.path, f"{name}.f8")
+        if os.path.getsize(filename) < COLUMN_DTYPE.itemsize:
+            return np.zeros(0, dtype=COLUMN_DTYPE)
+        return np.memmap(filename, dtype=COLUMN_DTYPE, mode="r")
+
+    def __len__(self):
+        return self.length
+
+    def column(self, name):
+        return self.data[name][:self.length]
+
+    @property
+    def start_time(self):
+        return float(self.data["received_at"][0]) if self.length else 0.0
+
+    @property
+    def duration(self):
+        return float(self.data["received_at"][self.length - 1]) - self.start_time if self.length else 0.0
+
+    def index(self, mission_time):
+        # Receive times are monotonic, so the time index is a binary search
+        return int(np.searchsorted(self.column("received_at"), self.start_time + mission_time))
+
+    def row(self, i):
+        return [self.data[name][i] for name in COLUMNS]
+
+    def record(self, i):
+        return row_to_record(self.row(i))
+
+
+class MissionReplay(TelemetrySource):
+    # Feeds a recorded mission to the dashboard like a serial receiver does,
+    # at 1x, 10x or maximum speed (speed=None).
+    live = False
+
+    def __init__(self, path, on_frames=None, speed=1.0, start_time=0.0, max_frames=1000, batch_size=256,
+                 metrics=None, name=None):
+        super().__init__(on_frames, max_frames, metrics, name)
+        self.log = MissionLog(path)
+        self.speed = speed
+        self.batch_size = batch_size
+        self.position = 0
+        self.seek_time = start_time
+
+    def seek(self, mission_time):
+        self.seek_time = mission_time
+
+    def run(self):
+        times = self.log.column("received_at")
+        while self.running.is_set() and self.position < len(times):
+            if self.seek_time is not None:
+                self.position = self.log.index(self.seek_time)
+                clock_start, mission_start = time.monotonic(), self.log.start_time + self.seek_time
+                self.seek_time = None
+
+            if self.speed:
+                now = mission_start + (time.monotonic() - clock_start) * self.speed
+                end = min(int(np.searchsorted(times, now, "right")), self.position + self.batch_size)
+            elif len(self.frames) + self.batch_size > self.frames.maxlen:
+                end = self.position  # At maximum speed wait for the consumer instead of dropping
+            else:
+                end = min(self.position + self.batch_size, len(times))
+
+            if end <= self.position:
+                time.sleep(0.01)
+                continue
+            for i in range(self.position, end):
+                self.push(float(times[i]), self.log.record(i))
+            self.frames_decoded.inc(end - self.position)
+            self.position = end
+            if self.on_frames:
+                self.on_frames()
@@ -0,0 +1,42 @@
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal
+import serial.tools.list_ports
+
+SCAN_INTERVAL = 2.0  # seconds between hot-plug checks
+
+
+class PortScanner(QObject):
+    # Enumerates serial ports on a background thread and keeps the result
+    # cached, so dialogs never call comports() on the GUI thread. The list is
+    # re-checked every few seconds and ports_changed fires on hot-plug.
+    ports_changed = pyqtSignal(list)
+
+    def __init__(self, interval=SCAN_INTERVAL, parent=None):
+        super().__init__(parent)
+        self.ports = []
+        self.interval = interval
+        self.wake = threading.Event()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def refresh(self):
+        # Scan now instead of waiting for the next interval
+        self.wake.set()
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+
+    def run(self):
+        while self.running:
+            try:
+                ports = sorted(port.device for port in serial.tools.list_ports.comports())
+            except OSError as e:
+                print(f"Port scan error: {e}")
+                ports = self.ports
+            if ports != self.ports:
+                self.ports = ports
+                self.ports_changed.emit(ports)
+            self.wake.wait(self.interval)
+            self.wake.clear()
@@ -0,0 +1,271 @@
+import json
+import os
+from collections import deque
+from telemetry_core import TelemetryPipeline, open_source, close_source
+from telemetry_source import CONNECTED
+from metrics import Metrics, metric_name
+from commands import RATE_GROUPS, command_key, link_commands
+from fanout import FanoutServer
+from settings import DEFAULT_CAN
+
+# Several HC-12 receivers at once, for several cans or for antenna diversity.
+# Every receiver keeps its own reader thread and hand-off queue, so adding
+# one never slows the others down. Receivers listening to the same can are
+# merged into one pipeline with duplicate frames removed; when a can is heard
+# by more than one receiver each receiver also gets a pipeline of its own.
+
+DEDUP_WINDOW = 1.0  # seconds in which the same frame from another receiver counts as a duplicate
+
+
+def parse_receivers(settings):
+    # The main COM port plus the "receivers" setting, e.g. "COM4, COM5@Can2".
+    # Entries without "@" listen to the main can. Returns {port: can}.
+    if settings.get("replay_path"):
+        # A recording is a single, already merged source
+        return {settings["replay_path"]: DEFAULT_CAN}
+    receivers = {settings.get("com_port", ""): DEFAULT_CAN}
+    for entry in settings.get("receivers", "").split(","):
+        port, _, can = entry.partition("@")
+        port = port.strip()
+        if port and port not in receivers:
+            receivers[port] = can.strip() or DEFAULT_CAN
+    return receivers
+
+
+def frame_key(record):
+    # Binary frames carry a sequence number; JSON documents are compared whole
+    key = record["seq"] if "seq" in record else tuple(sorted(record.items()))
+    try:
+        hash(key)
+    except TypeError:
+        # A list or object value, e.g. a noisy line that still parsed
+        return json.dumps(record, sort_keys=True)
+    return key
+
+
+class Deduplicator:
+    # Remembers which receiver delivered each frame during the last `window`
+    # seconds. The same frame from a different receiver is a duplicate; the
+    # same frame twice from one receiver is the can repeating itself.
+    def __init__(self, window=DEDUP_WINDOW, duplicates=None):
+        self.window = window
+        self.duplicates = duplicates
+        self.seen = {}  # key -> (receiver, received_at)
+        self.order = deque()  # (received_at, key), oldest first
+
+    def accept(self, receiver, received_at, record):
+        while self.order and received_at - self.order[0][0] > self.window:
+            seen_at, key = self.order.popleft()
+            if self.seen.get(key, (None, None))[1] == seen_at:
+                del self.seen[key]
+        key = frame_key(record)
+        if key is None:
+            return True
+        previous = self.seen.get(key)
+        if previous is not None and previous[0] != receiver:
+            if self.duplicates is not None:
+                self.duplicates.inc()
+            return False
+        self.seen[key] = (receiver, received_at)
+        self.order.append((received_at, key))
+        return True
+
+
+class ReceiverGroup:
+    # Owns the open sources and their pipelines. Front ends pick one of
+    # `views()` to display; all of them are kept up to date by drain().
+    def __init__(self, metrics=None):
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.settings = {}
+        self.receivers = {}  # port -> can
+        self.sources = {}  # port -> (source, connection settings it was opened with)
+        self.merged = {}  # can -> pipeline
+        self.dedup = {}  # can -> Deduplicator
+        self.per_receiver = {}  # port -> pipeline, only for cans heard by several receivers
+        self.server = None  # republishes the merged frames, see fanout.py
+
+    def configure(self, settings, on_frames=None):
+        # Opens receivers that are new or whose connection settings changed and
+        # closes the ones no longer listed. Receivers left as they were keep
+        # running, so adding one does not interrupt the others.
+        self.settings = settings
+        self.receivers = parse_receivers(settings)
+        cans = list(dict.fromkeys(self.receivers.values()))
+        shared = [can for can in cans if list(self.receivers.values()).count(can) > 1]
+
+        for can in list(self.merged):
+            if can not in cans:
+                self.merged.pop(can).stop_recording()
+                del self.dedup[can]
+        # The main can and port keep the plain metric names, the others are scoped
+        for can in cans:
+            can_settings = self.can_settings(can, cans)
+            if can in self.merged:
+                self.merged[can].update_settings(can_settings)
+            else:
+                name = None if can == DEFAULT_CAN else can
+                self.merged[can] = TelemetryPipeline(can_settings, self.metrics, name=name)
+                self.dedup[can] = Deduplicator(duplicates=self.metrics.counter(metric_name("duplicates", name)))
+
+        for port in list(self.per_receiver):
+            if self.receivers.get(port) not in shared:
+                del self.per_receiver[port]
+        for port, can in self.receivers.items():
+            if can in shared:
+                if port in self.per_receiver:
+                    self.per_receiver[port].update_settings(settings)
+                else:
+                    self.per_receiver[port] = TelemetryPipeline(settings, self.metrics, name=port)
+
+        connection = tuple(settings.get(key) for key in ["baud_rate", "protocol", "replay_speed", "replay_start"])
+        for port in list(self.sources):
+            source, opened_with = self.sources[port]
+            # Replays start over whenever the settings are applied. Not waited
+            # for: a port being closed must not hold up the GUI.
+            if port not in self.receivers or opened_with != connection or not source.live or not source.is_alive():
+                close_source(source, wait=False)
+                del self.sources[port]
+        for port in self.receivers:
+            if port not in self.sources:
+                source = open_source({**settings, "com_port": port}, on_frames, self.metrics, self.scope(port))
+                if source is not None:
+                    self.sources[port] = (source, connection)
+
+        # Only live serial sessions are recorded, one recording per can. It runs
+        # on until the can has no live receiver left or its folder changes, so
+        # applying other settings mid-flight does not split the mission.
+        for can, pipeline in self.merged.items():
+            if any(source.live for port, (source, _) in self.sources.items() if self.receivers[port] == can):
+                if pipeline.recording_dir != pipeline.settings.get("record_dir"):
+                    pipeline.stop_recording()
+                pipeline.start_recording()
+            else:
+                pipeline.stop_recording()
+        self.sync_link()
+        self.configure_server(settings.get("serve_port", 0))
+
+    def configure_server(self, port):
+        if self.server is not None and self.server.port != port:
+            self.server.close()
+            self.server = None
+        if port and self.server is None:
+            try:
+                self.server = FanoutServer(port, metrics=self.metrics)
+            except OSError as e:
+                print(f"Fan-out server error: {e}")
+
+    def sync_link(self, resend=False):
+        # Sends each can the commands for transmit rates and format that it has
+        # not acknowledged through its commanding receiver, so applying the
+        # settings again retries the ones that timed out. Only when the settings
+        # include rates, so the headless receiver leaves the can alone unless
+        # asked. With `resend` every command goes out again, or STATUS without
+        # rates, and the acknowledgements show where the can stands.
+        configured = any(setting in self.settings for setting in RATE_GROUPS)
+        if not configured and not resend:
+            return
+        commands = ["STATUS"]
+        if configured:
+            try:
+                commands = link_commands(self.settings)
+            except ValueError as e:
+                print(f"Link error: {e}")
+                return
+        for can in self.merged:
+            source = self.commander(can)
+            if source is None:
+                continue
+            for command in commands:
+                if resend or source.acknowledged.get(command_key(command)) != command:
+                    source.send(command)
+
+    def commander(self, can):
+        # A connected receiver if the can has one, else any that is still trying.
+        # Fan-out clients cannot transmit; the station they follow commands the can.
+        candidates = [source for port, (source, _) in self.sources.items()
+                      if self.receivers[port] == can and hasattr(source, "send") and source.is_alive()]
+        for source in candidates:
+            if source.state == CONNECTED:
+                return source
+        return candidates[0] if candidates else None
+
+    def reattach(self, ports):
+        # Hot-plug: receivers waiting to reconnect retry now if their port is back
+        # Called from the scanner's thread, hence the copy
+        for port, (source, _) in list(self.sources.items()):
+            if port in ports and getattr(source, "state", CONNECTED) != CONNECTED:
+                source.reattach()
+
+    def link_states(self):
+        # (port, state) of every live receiver, e.g. ("COM3", "connected")
+        return [(port, source.state) for port, (source, _) in self.sources.items() if source.live]
+
+    def scope(self, port):
+        return None if port == next(iter(self.receivers)) else port
+
+    def can_settings(self, can, cans):
+        # With several cans each one is recorded to a folder of its own
+        record_dir = self.settings.get("record_dir")
+        if record_dir and len(cans) > 1:
+            return {**self.settings, "record_dir": os.path.join(record_dir, can)}
+        return self.settings
+
+    def views(self):
+        # (label, pipeline) pairs: each can merged, then each of its receivers
+        views = []
+        for can, pipeline in self.merged.items():
+            ports = [port for port in self.per_receiver if self.receivers[port] == can]
+            views.append((f"{can} (merged)" if ports else can, pipeline))
+            views.extend((f"{can} via {port}", self.per_receiver[port]) for port in ports)
+        return views
+
+    def drain(self):
+        # Each receiver is drained into its own pipeline; records for the same
+        # can are then merged in arrival order with duplicates removed
+        batches = {can: [] for can in self.merged}
+        live = {can: True for can in self.merged}
+        for port, (source, _) in self.sources.items():
+            can = self.receivers[port]
+            self.metrics.set_gauge(metric_name("queue_depth", self.scope(port)), len(source.frames))
+            frames = source.drain()
+            if port in self.per_receiver:
+                self.per_receiver[port].ingest(frames, source.live)
+            batches[can].extend((received_at, port, record) for received_at, record in frames)
+            live[can] = live[can] and source.live
+        for can, frames in batches.items():
+            if not frames:
+                continue
+            frames.sort(key=lambda frame: frame[0])
+            dedup = self.dedup[can]
+            frames = [(received_at, record) for received_at, port, record in frames
+                      if dedup.accept(port, received_at, record)]
+            self.merged[can].ingest(frames, live[can])
+            if self.server is not None:
+                self.server.publish(can, frames)
+
+    def set_qnh(self, qnh):
+        for _, pipeline in self.views():
+            pipeline.set_qnh(qnh)
+
+    def is_alive(self):
+        return any(source.is_alive() for source, _ in self.sources.values())
+
+    def pending(self):
+        return sum(len(source.frames) for source, _ in self.sources.values())
+
+    def clear(self):
+        for _, pipeline in self.views():
+            pipeline.clear()
+
+    def stop_recording(self):
+        for pipeline in self.merged.values():
+            pipeline.stop_recording()
+
+    def close(self):
+        for source, _ in self.sources.values():
+            close_source(source)
+        # Whatever the readers framed before stopping is still processed
+        self.drain()
+        self.sources = {}
+        self.stop_recording()
+        self.configure_server(0)
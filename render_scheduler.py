@@ -0,0 +1,52 @@
+import time
+from PyQt5.QtCore import QObject, QTimer
+from metrics import Metrics
+from settings import DEFAULT_DISPLAY_RATE
+
+
+class RenderScheduler(QObject):
+    # Ingest only marks what changed; a fixed-rate timer applies the latest
+    # label texts and redraws dirty curves once per frame, however many
+    # records arrived in between.
+    def __init__(self, display_rate=DEFAULT_DISPLAY_RATE, parent=None, metrics=None):
+        super().__init__(parent)
+        self.pending_labels = {}
+        self.curve_updaters = {}
+        self.dirty_curves = set()
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.redraw_time = self.metrics.histogram("redraw_time")
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.render)
+        self.set_display_rate(display_rate)
+
+    def set_display_rate(self, display_rate):
+        self.display_rate = max(1, int(display_rate))
+        self.timer.start(int(1000 / self.display_rate))
+
+    def set_label(self, label, text):
+        self.pending_labels[label] = text
+
+    def register_curve(self, name, updater):
+        self.curve_updaters[name] = updater
+
+    def mark_curve(self, name):
+        self.dirty_curves.add(name)
+
+    def render(self):
+        if not self.pending_labels and not self.dirty_curves:
+            return
+        started = time.perf_counter()
+        if self.pending_labels:
+            labels, self.pending_labels = self.pending_labels, {}
+            for label, text in labels.items():
+                if label.text() != text:
+                    label.setText(text)
+        if self.dirty_curves:
+            names, self.dirty_curves = self.dirty_curves, set()
+            for name in names:
+                self.curve_updaters[name]()
+        self.redraw_time.record(time.perf_counter() - started)
+
+    def stop(self):
+        self.timer.stop()
@@ -0,0 +1,224 @@
+import json
+import re
+import threading
+import time
+import serial
+from binary_protocol import decode_frames, to_records
+from commands import COMMAND_RETRY, COMMAND_TIMEOUT, command_key
+from metrics import metric_name
+from telemetry_source import TelemetrySource
+
+# Command acknowledgements are JSON lines in either telemetry format
+ACK_LINE = re.compile(rb'\{"ack"[^\n]*\n')
+ACK_MAX = 256  # bytes of a partial acknowledgement kept for the next read
+MAX_LINE = 1024  # bytes without a newline after which a JSON line is radio noise
+
+READ_TIMEOUT = 0.5  # s; lets a reader thread notice when it is asked to stop
+
+
+class SerialReader(TelemetrySource):
+    # Blocks on an open serial port in the background and decodes what it
+    # reads into records; see TelemetrySource. The port was opened by the
+    # caller, so it is read until it fails and never reopened.
+    reopen = False
+    error_label = "Error reading serial data"
+
+    def __init__(self, serial_port, on_frames=None, max_frames=1000, protocol="json", metrics=None, name=None):
+        super().__init__(on_frames, max_frames, metrics, name)
+        self.serial_port = serial_port
+        self.bytes_received = self.metrics.counter(metric_name("bytes_received", name))
+        self.json_errors = self.metrics.counter(metric_name("json_errors", name))
+        self.discarded_bytes = self.metrics.counter(metric_name("discarded_bytes", name))
+        self.commands_sent = self.metrics.counter(metric_name("commands_sent", name))
+        # Receive buffer reused for every read: bytes are appended at the end and
+        # consumed ones dropped from the front in place
+        self.buffer = bytearray()
+        self.ack_buffer = b""
+        self.decode = self.decode_binary if protocol == "binary" else self.decode_json
+        # Ground commands waiting for their acknowledgement: key -> [command, next send, deadline].
+        # The deadline starts with the first write, so a receiver still opening loses nothing.
+        self.commands = {}
+        self.commands_lock = threading.Lock()
+        self.acknowledged = {}  # key -> last command the can acknowledged without an error
+
+    def send(self, command):
+        # Queued for the reader thread, which writes it and repeats it until the
+        # can acknowledges it: the can only hears the HC-12 between GPS bursts
+        with self.commands_lock:
+            self.commands[command_key(command)] = [command, 0.0, None]
+
+    def send_commands(self, now):
+        with self.commands_lock:
+            for key, entry in list(self.commands.items()):
+                command, next_send, deadline = entry
+                if deadline is not None and now > deadline:
+                    del self.commands[key]
+                    print(f"No acknowledgement from the CanSat for '{command}'")
+                elif now >= next_send:
+                    self.serial_port.write(command.encode() + b"\n")
+                    self.commands_sent.inc()
+                    entry[1] = now + COMMAND_RETRY
+                    if deadline is None:
+                        entry[2] = now + COMMAND_TIMEOUT
+
+    def acknowledge(self, record):
+        command = str(record["ack"])
+        with self.commands_lock:
+            entry = self.commands.get(command_key(command))
+            if entry is not None and entry[0] == command:
+                del self.commands[command_key(command)]
+        if "error" in record:
+            print(f"CanSat rejected '{command}': {record['error']}")
+        else:
+            self.acknowledged[command_key(command)] = command
+
+    def connect(self):
+        pass
+
+    def connected(self, reconnected):
+        pass
+
+    def read_loop(self):
+        # Returns None when stopped, or the exception that ended the reading
+        while self.running.is_set():
+            try:
+                if self.commands:
+                    self.send_commands(time.monotonic())
+                # Blocks until at least one byte arrives or the port timeout expires
+                chunk = self.serial_port.read(self.serial_port.in_waiting or 1)
+            except Exception as e:
+                return e
+            if chunk and self.handle_chunk(chunk, time.monotonic()) and self.on_frames:
+                self.on_frames()
+        return None
+
+    def handle_chunk(self, chunk, received_at):
+        self.bytes_received.inc(len(chunk))
+        records = self.decode(chunk)
+        for record in records:
+            if "ack" in record:
+                self.acknowledge(record)
+            self.push(received_at, record)
+        self.frames_decoded.inc(len(records))
+        return len(records)
+
+    def decode_json(self, chunk):
+        # Lines are located in the buffer by offset and only the text of each
+        # frame is decoded, so a chunk is never decoded or split into copies.
+        # The trailing partial line waits for the next read.
+        buffer = self.buffer
+        buffer += chunk
+        records = []
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            record = self.parse_line(buffer, start, end)
+            if record is not None:
+                records.append(record)
+            start = end + 1
+        del buffer[:start]
+        # Noise that never reaches a newline; keep what may be the start of a frame
+        if len(buffer) > MAX_LINE:
+            keep = buffer.rfind(b"{", len(buffer) - MAX_LINE)
+            drop = keep if keep > 0 else len(buffer)
+            self.discarded_bytes.inc(drop)
+            del buffer[:drop]
+        return records
+
+    def parse_line(self, buffer, start, end):
+        # Returns the record in buffer[start:end], or None. Radio noise only
+        # costs the frames it hits: bytes before the opening brace are skipped,
+        # and if the line still does not parse, the last brace may start a
+        # frame whose newline was lost. Whatever is not used is discarded.
+        first = buffer.find(b"{", start, end)
+        if first < 0:
+            if buffer[start:end].strip():
+                self.discarded_bytes.inc(end - start)
+                self.json_errors.inc()
+            return None
+        for brace in dict.fromkeys([first, buffer.rfind(b"{", first, end)]):
+            try:
+                record = json.loads(buffer[brace:end].decode())
+            except ValueError:  # also invalid UTF-8
+                continue
+            if brace > first:  # the frame in front of it is lost
+                self.json_errors.inc()
+            self.discarded_bytes.inc(brace - start)
+            return record
+        self.json_errors.inc()
+        self.discarded_bytes.inc(end - start)
+        return None
+
+    def decode_binary(self, chunk):
+        # All complete frames in the buffer are decoded in one vectorized pass
+        buffer = self.buffer
+        buffer += chunk
+        frames, consumed, discarded = decode_frames(buffer)
+        records = to_records(frames)
+        if discarded or self.ack_buffer:
+            records.extend(self.find_acks(buffer[:consumed]))
+        del buffer[:consumed]
+        self.discarded_bytes.inc(discarded)
+        return records
+
+    def find_acks(self, data):
+        # Acknowledgements arrive between frames, among the discarded bytes
+        text = self.ack_buffer + data
+        acks, end = [], 0
+        for match in ACK_LINE.finditer(text):
+            end = match.end()
+            try:
+                record = json.loads(match.group())
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                acks.append(record)
+        start = text.find(b'{"ack"', end)
+        if start < 0:
+            # The read may have stopped inside the opening '{"ack"' itself
+            start = text.rfind(b"{", max(end, len(text) - len(b'{"ack"') + 1))
+            if start >= 0 and not b'{"ack"'.startswith(text[start:]):
+                start = -1
+        self.ack_buffer = text[start:] if start >= 0 and len(text) - start <= ACK_MAX else b""
+        return acks
+
+
+class SerialConnection(SerialReader):
+    # A SerialReader that opens its port itself and reopens it when the
+    # receiver is unplugged or glitches, see TelemetrySource.run.
+    connect_errors = (serial.SerialException, OSError, ValueError)
+    reopen = True
+    error_label = "Serial port error"
+
+    def __init__(self, port, baud_rate, on_frames=None, max_frames=1000, protocol="json", metrics=None, name=None):
+        super().__init__(None, on_frames, max_frames, protocol, metrics, name)
+        self.port = port
+        self.address = port
+        self.baud_rate = baud_rate
+        self.sent = {}  # latest command per key, repeated after a reconnect
+
+    def send(self, command):
+        self.sent[command_key(command)] = command
+        super().send(command)
+
+    def connect(self):
+        self.serial_port = serial.Serial(self.port, self.baud_rate, timeout=READ_TIMEOUT)
+
+    def connected(self, reconnected):
+        if reconnected:
+            # The can may have been reset while the receiver was away
+            self.acknowledged.clear()
+            for command in list(self.sent.values()):
+                super().send(command)
+        print(f"Connected to {self.port} at {self.baud_rate} baud")
+        # A frame cut off by the outage cannot be completed
+        self.buffer.clear()
+        self.ack_buffer = b""
+
+    def disconnect(self):
+        try:
+            self.serial_port.close()
+        except (serial.SerialException, OSError):
+            pass
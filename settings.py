@@ -0,0 +1,31 @@
+# Ground-station settings shared by the menu, the dashboard and the headless
+# receiver. Kept free of heavy imports so the menu can come up before numpy
+# and pyqtgraph are loaded.
+
+DEFAULT_HISTORY = 10000  # samples kept in memory per channel
+DEFAULT_DISPLAY_RATE = 25  # repaints per second
+PROTOCOLS = ["json", "binary"]
+REPLAY_SPEEDS = {"1x": 1.0, "10x": 10.0, "max": None}
+DEFAULT_CAN = "CanSat"  # name of the main can when several are received
+
+DEFAULT_SETTINGS = {
+    "com_port": "COM1",
+    "receivers": "",  # extra receivers, e.g. "COM4, COM5@Can2"
+    "baud_rate": 9600,
+    "protocol": "json",
+    "history_size": DEFAULT_HISTORY,
+    "display_rate": DEFAULT_DISPLAY_RATE,
+    "record_dir": "missions",
+    "replay_path": "",
+    "replay_speed": "1x",
+    "replay_start": 0.0,
+    "serve_port": 0,  # TCP port the telemetry is republished on (see fanout.py), 0 for off
+    # Altitude reference: sea-level pressure in hPa, and the launch site's
+    # elevation in metres that Calibrate QNH assumes for the pad readings
+    "qnh": 1013.25,
+    "field_elevation": 0.0,
+    # Transmit rates in Hz that the CanSat is commanded to, per sensor group
+    "attitude_rate": 1.0,
+    "environment_rate": 1.0,
+    "gps_rate": 1.0
+}
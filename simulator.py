@@ -0,0 +1,247 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from binary_protocol import encode_frame, FLAG_LOCATION_VALID, FLAG_DATE_VALID, FLAG_TIME_VALID
+from commands import MAX_RATE
+from settings import PROTOCOLS
+
+# Stand-in for the CanSat: streams the same telemetry CanSat.ino sends, over
+# a pseudo-terminal (or any serial port) so ArduinoGUI can run without hardware.
+
+SEA_LEVEL_PRESSURE = 101325.0  # Pa
+START_LOCATION = (33.6844, 73.0479)
+APOGEE = 1000.0  # m
+ASCENT_TIME = 20.0  # s
+DESCENT_RATE = 8.0  # m/s under parachute
+WIND_SPEED = 3.0  # m/s, drifting east
+GPS_FIX_TIME = 5.0  # s before the GPS reports a valid fix
+GROUPS = ["ATT", "ENV", "GPS"]  # sensor groups in the order of json_documents
+COMMAND_POLL = 0.05  # s between checks for ground commands
+
+
+class CanSatSimulator:
+    def __init__(self, protocol="json", noise=0.5, corruption=0.0, seed=None):
+        self.protocol = protocol
+        self.noise = noise
+        self.corruption = corruption
+        self.random = random.Random(seed)
+        self.seq = 0
+        self.start = time.time()
+        # Transmit rate per group in Hz, changed by ground commands; None until stream() starts
+        self.rates = dict.fromkeys(GROUPS)
+        self.sent = dict.fromkeys(GROUPS, -math.inf)
+        self.command_buffer = b""
+
+    def state(self, t):
+        # Climb to apogee, then a steady parachute descent while spinning
+        if t < ASCENT_TIME:
+            altitude = APOGEE * math.sin(0.5 * math.pi * t / ASCENT_TIME)
+        else:
+            altitude = max(APOGEE - DESCENT_RATE * (t - ASCENT_TIME), 0.0)
+        noise = lambda scale: self.random.gauss(0.0, self.noise * scale)
+        lat, lng = START_LOCATION
+        drift = WIND_SPEED * t if altitude > 0 else WIND_SPEED * (ASCENT_TIME + APOGEE / DESCENT_RATE)
+        return {
+            "yaw": 20.0 * t + noise(1.0),
+            "pitch": 10.0 * math.sin(2 * math.pi * t / 3.0) + noise(1.0),
+            "roll": 8.0 * math.sin(2 * math.pi * t / 2.3) + noise(1.0),
+            "temperature": 25.0 - 0.0065 * altitude + noise(0.1),
+            "pressure": SEA_LEVEL_PRESSURE * (1 - 2.25577e-5 * altitude) ** 5.25588 + noise(10.0),
+            "altitude": altitude + noise(0.5),
+            "lat": lat,
+            "lng": lng + drift / (111320.0 * math.cos(math.radians(lat))),
+            "gps_valid": t >= GPS_FIX_TIME,
+            "gps_time": datetime.fromtimestamp(self.start + t, timezone.utc),
+        }
+
+    def messages(self, t, groups=GROUPS):
+        # One update: a JSON line per group, or one binary frame with all of them
+        if not groups:
+            return []
+        state = self.state(t)
+        if self.protocol == "binary":
+            return [self.binary_frame(t, state)]
+        return [self.json_line(doc) for group, doc in zip(GROUPS, self.json_documents(state)) if group in groups]
+
+    def due_groups(self, t):
+        due = []
+        for group, rate in self.rates.items():
+            if rate and t - self.sent[group] >= 1.0 / rate - 1e-6:
+                self.sent[group] = t
+                due.append(group)
+        return due
+
+    def handle_commands(self, data):
+        # Returns the acknowledgement lines for every complete command line in `data`
+        lines = (self.command_buffer + data).split(b"\n")
+        self.command_buffer = lines.pop()[-64:]
+        acks = []
+        for raw in lines:
+            line = raw.strip().decode("ascii", errors="replace")
+            if line:
+                acks.append(self.json_line(self.handle_command(line)))
+        return acks
+
+    def handle_command(self, line):
+        # Same commands and acknowledgement as handleCommand() in CanSat.ino
+        words = line.split()
+        error = None
+        if words[:1] == ["RATE"]:
+            if len(words) < 3 or words[1] not in GROUPS:
+                error = "usage: RATE ATT|ENV|GPS <Hz>"
+            else:
+                try:
+                    rate = float(words[2])
+                except ValueError:
+                    rate = 0.0  # like atof()
+                if not 0 <= rate <= MAX_RATE:
+                    error = "rate out of range"
+                else:
+                    self.rates[words[1]] = rate
+        elif words[:1] == ["FORMAT"]:
+            if words[1:2] in (["JSON"], ["BINARY"]):
+                self.protocol = words[1].lower()
+            else:
+                error = "usage: FORMAT JSON|BINARY"
+        elif words[:1] != ["STATUS"]:
+            error = "unknown command"
+        ack = {"ack": line}
+        if error:
+            ack["error"] = error
+        ack.update({group.lower(): self.rates[group] or 0.0 for group in GROUPS})
+        ack["format"] = self.protocol
+        return ack
+
+    def json_documents(self, state):
+        # Same fields and order as updateMPU6050, updateBMP280 and displayGPSInfo
+        gps_time = state["gps_time"]
+        valid = state["gps_valid"]
+        return [
+            {key: round(state[key], 2) for key in ["yaw", "pitch", "roll"]},
+            {key: round(state[key], 2) for key in ["temperature", "pressure", "altitude"]},
+            {
+                "location": f"{state['lat']:.6f},{state['lng']:.6f}" if valid else "INVALID",
+                "date": f"{gps_time.month}/{gps_time.day}/{gps_time.year}" if valid else "INVALID",
+                "time": gps_time.strftime("%H:%M:%S") if valid else "INVALID",
+            },
+        ]
+
+    def json_line(self, doc):
+        return json.dumps(doc, separators=(",", ":")).encode() + b"\r\n"
+
+    def binary_frame(self, t, state):
+        gps_time = state["gps_time"]
+        flags = FLAG_LOCATION_VALID | FLAG_DATE_VALID | FLAG_TIME_VALID if state["gps_valid"] else 0
+        frame = encode_frame(self.seq, int(t * 1000), state, flags=flags,
+                             date=(gps_time.month, gps_time.day, gps_time.year),
+                             time=(gps_time.hour, gps_time.minute, gps_time.second, gps_time.microsecond // 10000))
+        self.seq += 1
+        return frame
+
+    def corrupt(self, data):
+        # Flip random bytes, like noise on the HC-12 link
+        if not self.corruption:
+            return data
+        data = bytearray(data)
+        for i in range(len(data)):
+            if self.random.random() < self.corruption:
+                data[i] = self.random.randrange(256)
+        return bytes(data)
+
+    def stream(self, write, rate=1.0, duration=None, burst=0.0, baud=0, on_sent=None, read=None):
+        # Sends `rate` updates per second until ground commands (polled with
+        # `read`) set other rates per group. With burst > 0 updates are held back
+        # with that probability and then released together, like a buffering radio.
+        # Mission time follows the wall clock, so a saturated link lowers the update rate like on the can
+        for group in GROUPS:
+            if self.rates[group] is None:
+                self.rates[group] = rate
+        start = next_tick = time.monotonic()
+        held = []
+        while duration is None or time.monotonic() - start < duration:
+            if read is not None:
+                for ack in self.handle_commands(read()):
+                    write(ack)
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                # Slow groups must not hold up the answer to a command
+                time.sleep(min(delay, COMMAND_POLL) if read is not None else delay)
+                continue
+            tick = next_tick - start
+            fastest = max(self.rates.values())
+            next_tick = max(next_tick + (1.0 / fastest if fastest else COMMAND_POLL), time.monotonic())
+            messages = self.messages(time.monotonic() - start, self.due_groups(tick))
+            if not messages:
+                continue
+            held.extend(messages)
+            if burst and self.random.random() < burst:
+                continue
+            data = self.corrupt(b"".join(held))
+            if on_sent:
+                on_sent(len(held), time.monotonic())
+            write(data)
+            held = []
+            if baud:
+                time.sleep(len(data) * 10 / baud)  # 8N1: ten bits per byte
+
+
+def open_pty():
+    import tty
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    return master, slave, os.ttyname(slave)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate the CanSat telemetry link")
+    parser.add_argument("--port", help="write to this serial port instead of creating a pseudo-terminal")
+    parser.add_argument("--baud", type=int, default=9600, help="link speed to emulate (0 for unlimited)")
+    parser.add_argument("--protocol", choices=PROTOCOLS, default="json")
+    parser.add_argument("--rate", type=float, default=1.0, help="updates per second")
+    parser.add_argument("--duration", type=float, help="seconds to run (default: forever)")
+    parser.add_argument("--noise", type=float, default=0.5, help="sensor noise scale")
+    parser.add_argument("--corruption", type=float, default=0.0, help="probability of corrupting each byte")
+    parser.add_argument("--burst", type=float, default=0.0, help="probability of holding an update back")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    simulator = CanSatSimulator(args.protocol, args.noise, args.corruption, args.seed)
+    if args.port:
+        import serial
+        port = serial.Serial(args.port, args.baud or 9600)
+        write = port.write
+
+        def read():
+            return port.read(port.in_waiting)
+        print(f"Simulated CanSat writing to {args.port}")
+    else:
+        master, slave, name = open_pty()
+        # Like a radio with nobody listening: drop data rather than block when the buffer is full
+        os.set_blocking(master, False)
+
+        def write(data):
+            try:
+                os.write(master, data)
+            except BlockingIOError:
+                pass
+
+        def read():
+            try:
+                return os.read(master, 1024)
+            except (BlockingIOError, OSError):
+                return b""
+        print(f"Simulated CanSat on {name} - use it as the COM port in Options")
+    sys.stdout.flush()
+    try:
+        simulator.stream(write, args.rate, args.duration, args.burst, args.baud, read=read)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from serial_reader import SerialConnection
+from fanout import FanoutClient, is_fanout
+from telemetry_store import TelemetryStore
+from decimation import MinMaxPyramid
+from mission_log import MissionRecorder, MissionReplay, new_mission_path, parse_location
+from settings import DEFAULT_HISTORY, REPLAY_SPEEDS
+from metrics import Metrics, metric_name
+from estimators import EstimatorEngine
+from ground_track import GroundTrack
+from commands import link_text
+from altitude import STANDARD_QNH, CALIBRATION_WINDOW, altitude_transform, calibrate_qnh, pressure_altitude
+
+# Everything between the telemetry source and the screen that does not need
+# Qt: opening sources, turning records into state, history and recording.
+# Used by ArduinoGUI and by the headless receiver.
+
+VALUE_KEYS = ["yaw", "pitch", "roll", "temperature", "pressure", "altitude", "location"]
+DISPLAY_KEYS = VALUE_KEYS + ["date_time_gmt", "date_time_pkt", "link"]
+ATTITUDE_CHANNELS = ["yaw", "pitch", "roll"]
+PKT_OFFSET = timedelta(hours=5)
+TIME_CHANNELS = ["received_at", "time", "gps_time"]
+REWIND_LIMIT = 1.0  # seconds the receive time may step back before it counts as a new timeline
+
+
+def format_value(value):
+    # Display text of a state value. Values are kept as they arrive and only
+    # formatted for the labels; binary frames carry raw float32 readings.
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    if isinstance(value, tuple):
+        return f"{value[0]:.6f},{value[1]:.6f}"
+    if isinstance(value, datetime):
+        return value.strftime("%m/%d/%Y %H:%M:%S.%f")
+    return str(value)
+
+
+def open_source(settings, on_frames=None, metrics=None, name=None):
+    # A replay file, when set, takes the place of the serial port.
+    # Returns the started source thread, or None if a replay could not be opened.
+    # `name` scopes the source's metrics when several receivers are open.
+    replay_path = settings.get("replay_path")
+    if replay_path:
+        try:
+            source = MissionReplay(replay_path, on_frames=on_frames,
+                                   speed=REPLAY_SPEEDS[settings.get("replay_speed", "1x")],
+                                   start_time=settings.get("replay_start", 0.0), metrics=metrics, name=name)
+        except (OSError, ValueError) as e:
+            print(f"Replay error: {e}")
+            return None
+        print(f"Replaying {replay_path} ({source.log.duration:.1f} s recorded)")
+    elif is_fanout(settings["com_port"]):
+        # Another station's republished feed instead of a receiver of our own
+        try:
+            source = FanoutClient(settings["com_port"], on_frames=on_frames, metrics=metrics, name=name)
+        except ValueError as e:
+            print(f"Fan-out address error: {e}")
+            return None
+    else:
+        # Opened, and reopened after a glitch, on the reader's own thread
+        source = SerialConnection(settings["com_port"], settings["baud_rate"], on_frames=on_frames,
+                                  protocol=settings.get("protocol", "json"), metrics=metrics, name=name)
+    source.start()
+    return source
+
+
+def close_source(source, wait=True):
+    # A serial connection closes its port itself once its thread has stopped
+    source.stop(wait)
+
+
+class TelemetryPipeline:
+    # Turns decoded records into the latest values, attitude history and a
+    # mission recording. Front ends only read `previous_values`, the store
+    # and the set of keys changed since they last looked.
+    def __init__(self, settings, metrics=None, name=None):
+        self.settings = settings
+        self.name = name
+        self.metrics = metrics if metrics is not None else Metrics()
+        # Derived quantities, updated online from every record
+        self.estimators = EstimatorEngine()
+        # Attitude and the estimator outputs drawn next to it
+        self.curve_channels = ATTITUDE_CHANNELS + self.estimators.outputs(plot=True)
+        # Kept for recalibration: raw pressure, altitude and what is derived from it
+        self.value_channels = ["pressure", "altitude"] + self.estimators.outputs(plot=False)
+        # Reference sea-level pressure the altitude is computed for, in hPa
+        self.qnh = settings.get("qnh", STANDARD_QNH)
+        # Fixed-capacity array history, optionally spilling older samples to disk.
+        # Every sample has its host receive time (time.monotonic()), the mission
+        # time plotted on the x-axis and the GPS time (UTC epoch, NaN before a fix).
+        self.store = TelemetryStore(
+            TIME_CHANNELS + self.curve_channels + self.value_channels,
+            capacity=settings.get("history_size", DEFAULT_HISTORY),
+            spill_dir=settings.get("spill_dir"),
+            time_channel="received_at",
+        )
+        # Valid GPS fixes, in metres from the first one
+        self.track = GroundTrack()
+        self.time_origin = None  # receive time of the first sample
+        self.gps_fix = None  # (GPS epoch, receive time) of the last valid GPS time
+        # Min/max summaries of the whole mission for zoomed-out views
+        self.pyramids = {name: MinMaxPyramid() for name in self.curve_channels}
+        self.previous_values = {key: "N/A" for key in DISPLAY_KEYS + self.estimators.outputs()}
+        self.changed = set()
+        self.recorder = None
+        self.recording_dir = None  # record_dir the recorder was started in
+
+        self.records = self.metrics.counter(metric_name("records", name))
+        self.queue_latency = self.metrics.histogram(metric_name("queue_latency", name))
+        self.parse_time = self.metrics.histogram(metric_name("parse_time", name))
+        self.parse_errors = self.metrics.counter(metric_name("parse_errors", name))
+
+    def update_settings(self, settings):
+        # Returns True if the history had to be resized
+        self.settings = settings
+        self.set_qnh(settings.get("qnh", STANDARD_QNH))
+        history_size = settings.get("history_size", DEFAULT_HISTORY)
+        if history_size != self.store.capacity:
+            self.store.resize(history_size)
+            return True
+        return False
+
+    def start_recording(self):
+        record_dir = self.settings.get("record_dir")
+        if record_dir and self.recorder is None:
+            self.recorder = MissionRecorder(new_mission_path(record_dir))
+            self.recording_dir = record_dir
+            print(f"Recording mission to {self.recorder.path}")
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def ingest(self, frames, live=True):
+        # Replayed records carry their original receive time, so only live data has a queue latency
+        now = time.monotonic()
+        for received_at, record in frames:
+            if live:
+                self.queue_latency.record(now - received_at)
+            # Command acknowledgements are link state, not telemetry
+            if self.recorder is not None and "ack" not in record:
+                self.recorder.append(received_at, record)
+            started = time.perf_counter()
+            self.process(record, received_at)
+            self.parse_time.record(time.perf_counter() - started)
+
+    def process(self, record, received_at=None):
+        self.records.inc()
+        if received_at is None:
+            received_at = time.monotonic()
+        try:
+            # Acknowledgement of a ground command: reports the can's transmit settings
+            if "ack" in record:
+                self.previous_values["link"] = link_text(record)
+                self.changed.add("link")
+                return
+
+            # Altitude is derived here, from the raw pressure and the current QNH;
+            # the can's own value assumes the standard 1013.25 hPa
+            if "pressure" in record or "altitude" in record:
+                record = {**record, "altitude": self.altitude(record)}
+
+            for key in VALUE_KEYS:
+                if key in record:
+                    self.previous_values[key] = record[key]
+                    self.changed.add(key)
+
+            # Binary frames carry the position as numbers. A JSON location string
+            # is parsed once, here; "INVALID" gives NaN.
+            if "lat" in record:
+                lat, lng = record["lat"], record["lng"]
+                self.previous_values["location"] = (lat, lng)
+                self.changed.add("location")
+            else:
+                lat, lng = parse_location(record.get("location"))
+            if not math.isnan(lat):
+                self.track.append(lat, lng)
+                self.changed.add("track")
+
+            # Binary frames carry the CanSat's own clock, which is free of radio and USB jitter
+            t = record["millis"] / 1000 if "millis" in record else received_at
+            derived = self.estimators.update(t, record)
+            self.previous_values.update(derived)
+            self.changed.update(derived)
+
+            # Without a fix the GPS sends "INVALID" and the last valid time stays up.
+            # Binary frames carry the GPS time as a UTC epoch with centiseconds.
+            gmt_time = None
+            if "gps_time" in record:
+                gmt_time = datetime.fromtimestamp(record["gps_time"], timezone.utc).replace(tzinfo=None)
+            elif record.get("date", "INVALID") != "INVALID" and record.get("time", "INVALID") != "INVALID":
+                time_format = "%m/%d/%Y %H:%M:%S.%f" if "." in record["time"] else "%m/%d/%Y %H:%M:%S"
+                gmt_time = datetime.strptime(f"{record['date']} {record['time']}", time_format)
+            if gmt_time is not None:
+                self.previous_values["date_time_gmt"] = gmt_time
+                self.previous_values["date_time_pkt"] = gmt_time + PKT_OFFSET
+                self.changed.update(["date_time_gmt", "date_time_pkt"])
+                self.gps_fix = (gmt_time.replace(tzinfo=timezone.utc).timestamp(), received_at)
+
+            # No attitude sample until the first yaw/pitch/roll has arrived
+            if any(self.previous_values[name] == "N/A" for name in ATTITUDE_CHANNELS):
+                return
+            # The store stays sorted by receive time: small steps back from merged
+            # receivers are clamped, a large one starts a new timeline (a replay restarted)
+            last = self.store.last("received_at")
+            if received_at < last - REWIND_LIMIT:
+                self.clear()
+                self.time_origin = None
+            elif received_at < last:
+                received_at = last
+            if self.time_origin is None:
+                self.time_origin = received_at
+            values = {"received_at": received_at, "time": received_at - self.time_origin, "gps_time": float("nan")}
+            if self.gps_fix is not None:
+                values["gps_time"] = self.gps_fix[0] + received_at - self.gps_fix[1]
+            for name in self.curve_channels + self.value_channels:
+                value = self.previous_values[name]
+                values[name] = float(value) if value != "N/A" else float("nan")
+            self.store.append(values)
+            for name, pyramid in self.pyramids.items():
+                pyramid.append(values["time"], values[name])
+            self.changed.add("sample")
+
+        except Exception:
+            # Counted rather than printed: this runs once per record
+            self.parse_errors.inc()
+
+    def altitude(self, record):
+        try:
+            if "pressure" in record:
+                return float(pressure_altitude(float(record["pressure"]), self.qnh))
+            offset, scale = altitude_transform(STANDARD_QNH, self.qnh)
+            return offset + scale * float(record["altitude"])
+        except (TypeError, ValueError):
+            return "N/A"
+
+    def set_qnh(self, qnh):
+        # Moves the altitude history, the latest values and the estimators to a
+        # new reference pressure: one vectorized pass per channel, however long the history
+        if qnh == self.qnh:
+            return
+        offset, scale = altitude_transform(self.qnh, qnh)
+        self.qnh = qnh
+        self.changed.add("altitude")  # the label shows the QNH
+        changes = {"altitude": (offset, scale), **self.estimators.affine("altitude", offset, scale)}
+        for name, (offset, scale) in changes.items():
+            if name in self.store.buffers:
+                self.store.transform(name, offset, scale)
+            if isinstance(self.previous_values.get(name), (int, float)):
+                self.previous_values[name] = offset + scale * self.previous_values[name]
+                self.changed.add(name)
+
+    def calibrate(self, elevation=0.0, window=CALIBRATION_WINDOW):
+        # QNH from the last `window` seconds of pressure, with the can sitting at
+        # `elevation` metres; raises ValueError when there is no pressure yet
+        qnh = calibrate_qnh(self.store.view("pressure")[self.store.last_seconds(window)], elevation)
+        self.set_qnh(qnh)
+        return qnh
+
+    def take_changes(self):
+        changed, self.changed = self.changed, set()
+        return changed
+
+    def label_text(self, key):
+        value = format_value(self.previous_values[key])
+        if key == "date_time_gmt":
+            return f"Date/Time (GMT): {value}"
+        if key == "date_time_pkt":
+            return f"Date/Time (PKT): {value}"
+        if key == "link":
+            return f"Transmit Rates: {value}"
+        if key == "altitude":
+            return f"Altitude ({self.qnh:.2f} hPa): {value}"
+        if key not in DISPLAY_KEYS:
+            return f"{self.estimators.label(key)}: {value}"
+        return f"{key.capitalize()}: {value}"
+
+    def clear(self):
+        self.store.clear()
+        self.track.clear()
+        for pyramid in self.pyramids.values():
+            pyramid.clear()
+
+    def summary(self):
+        values = {key: format_value(value) for key, value in self.previous_values.items()}
+        derived = ", ".join(self.label_text(key) for key in self.estimators.outputs(plot=False))
+        errors = ", ".join(f"{name} {self.metrics.total(name)}"
+                           for name in ["json_errors", "discarded_bytes", "parse_errors", "dropped_frames", "duplicates"])
+        return (f"{self.records.value} records | yaw {values['yaw']} pitch {values['pitch']} roll {values['roll']} | "
+                f"alt {values['altitude']} (QNH {self.qnh:.2f}) temp {values['temperature']} | loc {values['location']} "
+                f"({self.track.distance():.0f} m from first fix) | "
+                f"GMT {values['date_time_gmt']} | {derived} | rates {values['link']} | errors: {errors}")
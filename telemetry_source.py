@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import deque
+from metrics import Metrics, metric_name
+
+RETRY_MIN = 0.05  # s before the first reopen, so a brief cable glitch costs little data
+RETRY_MAX = 5.0  # s between reopen attempts while a receiver is unplugged
+CONNECTING, CONNECTED, RECONNECTING, CLOSED = "connecting", "connected", "reconnecting", "closed"
+
+
+class TelemetrySource(threading.Thread):
+    # Base of the telemetry sources (serial receivers, fan-out clients and
+    # replays): a background thread that hands complete, timestamped records
+    # to the GUI through a bounded queue, so ingest never waits for a redraw.
+    #
+    # Sources with a connection implement connect() and read_loop(), and
+    # usually connected() and disconnect(). run() then opens the connection on
+    # the source's own thread, so the GUI never waits for it, and reopens it
+    # with exponential backoff when it is lost; reattach() (on hot-plug)
+    # retries at once. on_frames is also called when `state` changes.
+    live = True
+    connect_errors = (OSError,)  # raised by connect() while the other end is not there
+    reopen = True  # False when the connection belongs to the caller and ends with its first error
+    error_label = "Connection error"
+
+    def __init__(self, on_frames=None, max_frames=1000, metrics=None, name=None):
+        super().__init__(daemon=True)
+        self.on_frames = on_frames
+        # Bounded hand-off queue: if the GUI falls behind the oldest records are dropped
+        self.frames = deque(maxlen=max_frames)
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.frames_decoded = self.metrics.counter(metric_name("frames_decoded", name))
+        self.dropped_frames = self.metrics.counter(metric_name("dropped_frames", name))
+        self.reconnects = self.metrics.counter(metric_name("reconnects", name))
+        self.outage_time = self.metrics.histogram(metric_name("outage_time", name))
+        self.address = None  # what the source is connected to, for messages
+        self.state = CONNECTING
+        self.wake = threading.Event()
+        self.running = threading.Event()
+        self.running.set()
+
+    def stop(self, wait=True):
+        # Without `wait` the thread finishes its current read in the background
+        self.running.clear()
+        self.wake.set()  # out of a backoff wait
+        if wait and self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=1)
+
+    def reattach(self):
+        self.wake.set()
+
+    def set_state(self, state):
+        self.state = state
+        if self.on_frames:
+            self.on_frames()
+
+    def push(self, received_at, record):
+        if len(self.frames) == self.frames.maxlen:
+            self.dropped_frames.inc()
+        self.frames.append((received_at, record))
+
+    def drain(self):
+        records = []
+        while True:
+            try:
+                records.append(self.frames.popleft())
+            except IndexError:
+                return records
+
+    def connect(self):
+        # Opens the connection, or raises one of connect_errors
+        raise NotImplementedError
+
+    def connected(self, reconnected):
+        print(f"Connected to {self.address}")
+
+    def read_loop(self):
+        # Returns None when stopped, or the exception that ended the reading
+        raise NotImplementedError
+
+    def disconnect(self):
+        pass
+
+    def run(self):
+        delay = RETRY_MIN
+        lost_at = None
+        reported = False
+        while self.running.is_set():
+            try:
+                self.connect()
+            except self.connect_errors as e:
+                # Printed once per outage, not on every attempt
+                if not reported:
+                    print(f"{self.error_label}: {e}; retrying")
+                    reported = True
+                self.wake.wait(delay)
+                self.wake.clear()
+                delay = min(delay * 2, RETRY_MAX)
+                continue
+
+            if lost_at is not None:
+                self.reconnects.inc()
+                self.outage_time.record(time.monotonic() - lost_at)
+            self.connected(lost_at is not None)
+            delay, reported = RETRY_MIN, False
+            self.set_state(CONNECTED)
+
+            error = self.read_loop()
+            self.disconnect()
+            if error is None:
+                break
+            if not self.reopen:
+                print(f"{self.error_label}: {error}")
+                break
+            print(f"Lost {self.address}: {error}; reconnecting")
+            lost_at = time.monotonic()
+            self.set_state(RECONNECTING)
+        self.set_state(CLOSED)
@@ -0,0 +1,138 @@
+import os
+import numpy as np
+from settings import DEFAULT_HISTORY
+
+
+class RingBuffer:
+    # Fixed-capacity array buffer. Every sample is written twice (at i and
+    # i + capacity) so the last `capacity` samples are always one contiguous
+    # slice and views never need a copy.
+    def __init__(self, capacity=DEFAULT_HISTORY, dtype=np.float64, spill_path=None):
+        self.capacity = int(capacity)
+        self.dtype = np.dtype(dtype)
+        self.data = np.zeros(2 * self.capacity, dtype=self.dtype)
+        self.head = 0
+        self.count = 0
+        # Optional file that receives every completed lap before it is overwritten
+        self.spill_path = spill_path
+        self.spilled = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, value):
+        head = self.head
+        self.data[head] = value
+        self.data[head + self.capacity] = value
+        self.count += 1
+        head += 1
+        if head == self.capacity:
+            head = 0
+            self.spill()
+        self.head = head
+
+    def extend(self, values):
+        # Block version of append: one slice assignment per lap instead of one per sample
+        values = np.asarray(values, dtype=self.dtype)
+        while len(values):
+            head = self.head
+            n = min(len(values), self.capacity - head)
+            self.data[head:head + n] = values[:n]
+            self.data[head + self.capacity:head + self.capacity + n] = values[:n]
+            self.count += n
+            head += n
+            if head == self.capacity:
+                head = 0
+                self.spill()
+            self.head = head
+            values = values[n:]
+
+    def view(self):
+        if self.count < self.capacity:
+            return self.data[:self.count]
+        return self.data[self.head:self.head + self.capacity]
+
+    def last(self, default=np.nan):
+        if self.count == 0:
+            return default
+        return self.data[self.head + self.capacity - 1]
+
+    def spill(self):
+        # Called once per lap, so the cost stays O(1) per sample
+        if self.spill_path is None:
+            return
+        with open(self.spill_path, "ab") as f:
+            self.data[:self.capacity].tofile(f)
+        self.spilled += self.capacity
+
+    def transform(self, offset, scale):
+        # x -> offset + scale * x for every sample held, in one pass over both
+        # copies. Samples already spilled to disk keep their old values.
+        self.data *= scale
+        self.data += offset
+
+    def resize(self, capacity):
+        kept = self.view()[-int(capacity):].copy()
+        self.capacity = int(capacity)
+        self.data = np.zeros(2 * self.capacity, dtype=self.dtype)
+        self.head = 0
+        self.count = 0
+        for value in kept:
+            self.append(value)
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+
+class TelemetryStore:
+    # One ring buffer per channel, all advanced together one sample at a time.
+    # The `time_channel` must never decrease, so time queries on the
+    # in-memory window are binary searches.
+    def __init__(self, channels, capacity=DEFAULT_HISTORY, spill_dir=None, time_channel=None):
+        self.channels = list(channels)
+        self.capacity = int(capacity)
+        self.time_channel = time_channel if time_channel is not None else self.channels[0]
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+        self.buffers = {
+            name: RingBuffer(
+                capacity,
+                spill_path=os.path.join(spill_dir, f"{name}.f8") if spill_dir is not None else None,
+            )
+            for name in self.channels
+        }
+
+    def __len__(self):
+        return len(self.buffers[self.channels[0]])
+
+    def append(self, values):
+        # Channels missing from `values` are recorded as NaN
+        for name, buffer in self.buffers.items():
+            buffer.append(values.get(name, np.nan))
+
+    def view(self, name):
+        return self.buffers[name].view()
+
+    def last(self, name, default=np.nan):
+        return self.buffers[name].last(default)
+
+    def between(self, t0, t1):
+        # Slice of the in-memory window with t0 <= time <= t1
+        times = self.view(self.time_channel)
+        return slice(int(np.searchsorted(times, t0, "left")), int(np.searchsorted(times, t1, "right")))
+
+    def last_seconds(self, seconds):
+        return self.between(self.last(self.time_channel) - seconds, np.inf)
+
+    def transform(self, name, offset, scale):
+        self.buffers[name].transform(offset, scale)
+
+    def resize(self, capacity):
+        self.capacity = int(capacity)
+        for buffer in self.buffers.values():
+            buffer.resize(capacity)
+
+    def clear(self):
+        for buffer in self.buffers.values():
+            buffer.clear()
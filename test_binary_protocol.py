@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+import numpy as np
+import pytest
+import binary_protocol
+from binary_protocol import (FRAME_SIZE, SYNC, FLAG_LOCATION_VALID, FLAG_DATE_VALID, FLAG_TIME_VALID,
+                             crc_ccitt, crc16, decode_frames, encode_frame, to_records)
+
+# Wire format checks for binary telemetry. Every decode_frames test runs on
+# both paths: frame by frame (small reads) and column-wise (large buffers).
+
+
+def frame(seq, **values):
+    return encode_frame(seq, seq * 100, {"yaw": 1.5, "pressure": 1000.25, **values})
+
+
+@pytest.fixture(params=["scalar", "vectorized"])
+def decode(request, monkeypatch):
+    if request.param == "vectorized":
+        monkeypatch.setattr(binary_protocol, "SCALAR_FRAMES", 0)
+    return decode_frames
+
+
+def seqs(frames):
+    return [int(seq) for seq in frames["seq"]]
+
+
+def test_crc_known_answer():
+    assert crc_ccitt(b"123456789") == 0x29B1
+
+
+def test_column_crc_matches_scalar_crc(monkeypatch):
+    rows = np.random.default_rng(1).integers(0, 256, (40, FRAME_SIZE), dtype=np.uint8)
+    scalar = crc16(rows)
+    monkeypatch.setattr(binary_protocol, "SCALAR_FRAMES", 0)
+    assert np.array_equal(crc16(rows), scalar)
+    assert scalar[0] == crc_ccitt(rows[0, 2:FRAME_SIZE - 2].tobytes())
+
+
+def test_round_trip(decode):
+    data = encode_frame(7, 1234, {"yaw": 1.5, "altitude": 250.0, "lat": 33.6844, "lng": 73.0479},
+                        flags=FLAG_LOCATION_VALID | FLAG_DATE_VALID | FLAG_TIME_VALID,
+                        date=(8, 9, 2024), time=(12, 30, 15, 25))
+    frames, consumed, discarded = decode(data)
+    assert (consumed, discarded) == (FRAME_SIZE, 0)
+    [record] = to_records(frames)
+    assert record["seq"] == 7 and record["millis"] == 1234
+    assert record["yaw"] == 1.5 and record["altitude"] == 250.0
+    assert (record["lat"], record["lng"]) == (33.6844, 73.0479)
+    assert record["gps_time"] == datetime(2024, 8, 9, 12, 30, 15, 250000, timezone.utc).timestamp()
+
+
+def test_invalid_fields_are_left_out():
+    [record] = to_records(decode_frames(frame(1))[0])
+    assert record["location"] == "INVALID"
+    assert "lat" not in record and "gps_time" not in record
+
+
+def test_many_frames(decode):
+    data = b"".join(frame(seq) for seq in range(40))
+    frames, consumed, discarded = decode(data)
+    assert seqs(frames) == list(range(40))
+    assert (consumed, discarded) == (len(data), 0)
+
+
+def test_resync_after_garbage(decode):
+    garbage = b"\x00\x13noise\xaa"
+    data = garbage + frame(1) + b"\xaa\xaa\x55" + frame(2)
+    frames, consumed, discarded = decode(data)
+    assert seqs(frames) == [1, 2]
+    assert (consumed, discarded) == (len(data), len(garbage) + 3)
+
+
+def test_corrupted_frame_is_dropped(decode):
+    damaged = bytearray(frame(2))
+    damaged[20] ^= 0x01
+    data = frame(1) + bytes(damaged) + frame(3)
+    frames, consumed, discarded = decode(data)
+    assert seqs(frames) == [1, 3]
+    assert (consumed, discarded) == (len(data), FRAME_SIZE)
+
+
+def test_partial_frame_kept_across_reads(decode):
+    data = frame(1) + frame(2)
+    buffer = bytearray(data[:FRAME_SIZE + 10])
+    frames, consumed, discarded = decode(buffer)
+    assert seqs(frames) == [1]
+    assert (consumed, discarded) == (FRAME_SIZE, 0)
+    del buffer[:consumed]
+    buffer += data[FRAME_SIZE + 10:]
+    frames, consumed, discarded = decode(buffer)
+    assert seqs(frames) == [2]
+    assert (consumed, discarded) == (FRAME_SIZE, 0)
+
+
+def test_trailing_sync_byte_kept(decode):
+    frames, consumed, discarded = decode(frame(1) + SYNC[:1])
+    assert seqs(frames) == [1]
+    assert (consumed, discarded) == (FRAME_SIZE, 0)
+
+
+def test_false_sync_inside_valid_frame(decode):
+    # Little-endian 0x55AA is the sync pattern, inside the frame's seq field
+    inner = frame(0x55AA)
+    assert inner.find(SYNC, 1) == 4
+    data = inner + inner + frame(1)
+    frames, consumed, discarded = decode(data)
+    assert seqs(frames) == [0x55AA, 0x55AA, 1]
+    assert (consumed, discarded) == (len(data), 0)
+    # Alone, the false sync must not be kept as the start of a partial frame
+    assert decode(inner)[1:] == (FRAME_SIZE, 0)
@@ -0,0 +1,25 @@
+import math
+from estimators import EstimatorEngine
+
+# The estimators keep state for the whole flight, so one bad sample must not
+# stay in it.
+
+
+def test_non_finite_input_is_skipped():
+    engine = EstimatorEngine()
+    for i in range(20):
+        engine.update(i * 0.1, {"altitude": 100.0 + i, "yaw": 1.0})
+    results = engine.update(2.0, {"altitude": math.nan, "yaw": math.inf})
+    assert results == {}
+    results = engine.update(2.1, {"altitude": 121.0, "yaw": 1.0})
+    assert all(math.isfinite(results[name]) for name in ["altitude_filtered", "vertical_speed", "yaw_filtered"])
+
+
+def test_apogee_after_a_nan_sample():
+    engine = EstimatorEngine()
+    apogee = None
+    for i in range(200):
+        t = i * 0.1
+        altitude = math.nan if i == 50 else 500.0 - (t - 10.0) ** 2
+        apogee = engine.update(t, {"altitude": altitude}).get("apogee", apogee)
+    assert apogee is not None and 495.0 < apogee < 505.0
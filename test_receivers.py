@@ -0,0 +1,19 @@
+from receivers import Deduplicator
+
+# Frames heard by several receivers are passed on once, whatever JSON the
+# radio noise left in them.
+
+
+def test_duplicate_from_another_receiver_is_dropped():
+    dedup = Deduplicator()
+    assert dedup.accept("COM3", 0.0, {"yaw": 1.0})
+    assert not dedup.accept("COM4", 0.1, {"yaw": 1.0})
+    assert dedup.accept("COM3", 0.2, {"yaw": 1.0})
+
+
+def test_unhashable_values():
+    dedup = Deduplicator()
+    assert dedup.accept("COM3", 0.0, {"yaw": [1.0], "pitch": {"a": 2}})
+    assert not dedup.accept("COM4", 0.1, {"pitch": {"a": 2}, "yaw": [1.0]})
+    assert dedup.accept("COM3", 0.2, {"seq": [7]})
+    assert not dedup.accept("COM4", 0.3, {"seq": [7]})
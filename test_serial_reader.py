@@ -0,0 +1,127 @@
+import pytest
+from commands import COMMAND_RETRY, COMMAND_TIMEOUT
+from serial_reader import MAX_LINE, SerialReader
+from telemetry_source import CLOSED
+
+# Resync checks for the JSON line decoder: radio noise must only cost the
+# frames it damages, however the bytes are split into reads. Then the
+# retries of ground commands.
+
+
+def decode(*chunks):
+    reader = SerialReader(None)
+    records = []
+    for chunk in chunks:
+        records.extend(reader.decode_json(chunk))
+    return reader, records
+
+
+def counts(reader):
+    return reader.json_errors.value, reader.discarded_bytes.value
+
+
+def test_lines():
+    reader, records = decode(b'{"a": 1}\r\n\r\n{"b": 2}\n')
+    assert records == [{"a": 1}, {"b": 2}]
+    assert counts(reader) == (0, 0)
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 64])
+def test_line_split_across_reads(size):
+    data = b'{"a": 1}\n{"b": "x"}\n{"c": 3'
+    reader, records = decode(*[data[i:i + size] for i in range(0, len(data), size)])
+    assert records == [{"a": 1}, {"b": "x"}]
+    assert bytes(reader.buffer) == b'{"c": 3'
+    assert counts(reader) == (0, 0)
+
+
+def test_garbage_before_brace():
+    reader, records = decode(b'\x00\xffxx{"a": 1}\n')
+    assert records == [{"a": 1}]
+    assert counts(reader) == (0, 4)
+
+
+def test_garbage_line():
+    reader, records = decode(b'\x13\x37 noise\n{"a": 1}\n')
+    assert records == [{"a": 1}]
+    assert counts(reader) == (1, 8)
+
+
+def test_damaged_frame_resyncs_at_next_newline():
+    reader, records = decode(b'{"a": 1, "b\x02: 2}\n{"c": 3}\n')
+    assert records == [{"c": 3}]
+    assert counts(reader) == (1, 16)
+
+
+def test_lost_newline():
+    # The frame in front of the lost newline is lost, the one after it is kept
+    reader, records = decode(b'{"a": 1, "b": 2{"c": 3}\n{"d": 4}\n')
+    assert records == [{"c": 3}, {"d": 4}]
+    assert counts(reader) == (1, 15)
+
+
+def test_invalid_utf8():
+    reader, records = decode(b'{"a": "\xff\xfe"}\n{"b": 2}\n')
+    assert records == [{"b": 2}]
+    assert counts(reader) == (1, 11)
+
+
+def test_noise_longer_than_max_line():
+    noise = b"\x55" * (MAX_LINE + 10)
+    reader, records = decode(noise, b'{"a": 1}\n')
+    assert records == [{"a": 1}]
+    assert counts(reader) == (0, len(noise))
+
+
+def test_frame_start_kept_after_long_noise():
+    noise = b"\x55" * (MAX_LINE + 10)
+    reader, records = decode(noise + b'{"a"', b': 1}\n')
+    assert records == [{"a": 1}]
+    assert counts(reader) == (0, len(noise))
+
+
+class FakePort:
+    def __init__(self):
+        self.written = []
+
+    def write(self, data):
+        self.written.append(data)
+
+
+def test_command_deadline_starts_with_first_write():
+    # A command queued while the receiver is still opening is not yet late
+    reader = SerialReader(FakePort())
+    reader.send("RATE ATT 10")
+    reader.send_commands(100.0)
+    assert reader.serial_port.written == [b"RATE ATT 10\n"]
+    reader.send_commands(100.0 + COMMAND_RETRY)
+    assert len(reader.serial_port.written) == 2
+    reader.send_commands(100.0 + COMMAND_TIMEOUT + 1)
+    assert reader.commands == {}
+
+
+def test_command_acknowledged():
+    reader = SerialReader(FakePort())
+    reader.send("RATE ATT 10")
+    reader.send_commands(0.0)
+    reader.acknowledge({"ack": "RATE ATT 10", "att": 10})
+    assert reader.commands == {}
+    assert reader.acknowledged == {"RATE ATT": "RATE ATT 10"}
+    reader.acknowledge({"ack": "RATE GPS 99", "error": "rate out of range"})
+    assert "RATE GPS" not in reader.acknowledged
+
+
+class FailingPort(FakePort):
+    in_waiting = 0
+
+    def read(self, size):
+        raise OSError("device disconnected")
+
+
+def test_port_opened_by_caller_is_not_reopened():
+    reader = SerialReader(FailingPort())
+    reader.start()
+    reader.join(timeout=1)
+    assert not reader.is_alive()
+    assert reader.state == CLOSED
+    assert reader.reconnects.value == 0
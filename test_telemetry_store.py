@@ -0,0 +1,37 @@
+import numpy as np
+from telemetry_store import TelemetryStore
+
+# Time queries on the in-memory window, before and after the ring wraps.
+
+
+def store(times, capacity=8):
+    store = TelemetryStore(["t", "v"], capacity=capacity)
+    for t in times:
+        store.append({"t": t, "v": t * 10})
+    return store
+
+
+def test_between():
+    s = store([0.0, 1.0, 2.0, 2.0, 3.0, 5.0])
+    assert list(s.view("v")[s.between(1.0, 3.0)]) == [10.0, 20.0, 20.0, 30.0]
+    assert list(s.view("t")[s.between(3.5, 4.5)]) == []
+    assert list(s.view("t")[s.between(-np.inf, np.inf)]) == [0.0, 1.0, 2.0, 2.0, 3.0, 5.0]
+
+
+def test_last_seconds():
+    s = store([0.0, 1.0, 2.0, 3.0, 5.0])
+    assert list(s.view("t")[s.last_seconds(2.0)]) == [3.0, 5.0]
+    assert list(s.view("t")[s.last_seconds(0.0)]) == [5.0]
+
+
+def test_queries_after_wrap():
+    s = store(np.arange(20.0))
+    assert list(s.view("t")) == list(np.arange(12.0, 20.0))
+    assert list(s.view("v")[s.last_seconds(3.0)]) == [160.0, 170.0, 180.0, 190.0]
+    assert list(s.view("t")[s.between(0.0, 13.0)]) == [12.0, 13.0]
+
+
+def test_missing_channel_is_nan():
+    s = TelemetryStore(["t", "v"])
+    s.append({"t": 1.0})
+    assert np.isnan(s.last("v"))